@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import gzip
+import time
+import shutil
+import argparse
+import tempfile
+from log_analyzer.log_analyzer import parse_lines
+from log_analyzer.patterns import ui_log_string_fast
+from log_analyzer.readers import read_gzip, find_decompressor
+from benchmarks.bench_patterns import fixture
+
+
+def bench(file_path, reader, parse):
+    started = time.time()
+    lines = read_gzip(file_path, reader=reader)
+
+    if parse:
+        lines = parse_lines(lines, ui_log_string_fast)
+
+    count = sum(1 for __ in lines)
+    return count / (time.time() - started)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-f', '--file', default=None, help='gzipped log file')
+    parser.add_argument('-r', '--repeat', default=500, type=int, help='fixture copies in generated log')
+    args = parser.parse_args()
+
+    temp_dir = tempfile.mkdtemp()
+    file_path = args.file
+
+    try:
+        if not file_path:
+            file_path = os.path.join(temp_dir, 'nginx-access-ui.log.gz')
+            with open(fixture, 'rb') as lf, gzip.open(file_path, 'wb') as gf:
+                content = lf.read()
+                for __ in xrange(args.repeat):
+                    gf.write(content)
+
+        readers = ['gzip', 'thread'] + (['pipe'] if find_decompressor() else [])
+
+        for parse in (False, True):
+            for reader in readers:
+                print '{:<6} {:<5} {:>12,.0f} lines/sec'.format(
+                    reader, 'parse' if parse else 'read', bench(file_path, reader, parse)
+                )
+    finally:
+        shutil.rmtree(temp_dir)
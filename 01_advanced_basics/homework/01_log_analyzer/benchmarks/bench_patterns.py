@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import time
+import argparse
+from log_analyzer.patterns import ui_log_string_re, ui_log_string_fast, ui_log_format, compile_log_format
+
+fixture = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'tests', 'integration', 'fixtures', 'log', 'nginx-access-ui.log-20170701'
+)
+
+
+def bench(pattern, lines, repeat):
+    started = time.time()
+
+    for __ in xrange(repeat):
+        for line in lines:
+            match = pattern.match(line)
+            if match:
+                match.group('url'), match.group('request_time')
+
+    return len(lines) * repeat / (time.time() - started)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-f', '--file', default=fixture, help='log file')
+    parser.add_argument('-r', '--repeat', default=100, type=int, help='passes over the file')
+    args = parser.parse_args()
+
+    with open(args.file, 'rb') as lf:
+        lines = lf.readlines()
+
+    compiled = compile_log_format(ui_log_format)
+
+    for name, pattern in (('regex', ui_log_string_re), ('fast', ui_log_string_fast), ('format', compiled)):
+        print '{:<6} {:>12,.0f} lines/sec'.format(name, bench(pattern, lines, args.repeat))
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import gzip
+import random
+import argparse
+import datetime
+
+user_agents = (
+    'Lynx/2.8.8dev.9 libwww-FM/2.14 SSL-MM/1.4.1 GNUTLS/2.10.5',
+    'Python-urllib/2.7',
+    'Slotovod',
+    'Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36',
+    '-',
+)
+
+url_templates = (
+    '/api/v2/banner/{}',
+    '/api/v2/slot/{}/groups',
+    '/api/v2/group/{}/statistic/sites/?date_type=day&date_from=2017-06-28&date_to=2017-06-28',
+    '/api/1/photogenic_banners/list/?server_name=WIN7RB{}',
+    '/api/v2/internal/banner/{}/info',
+)
+
+
+def make_urls(count, rnd):
+    return [rnd.choice(url_templates).format(i) for i in xrange(count)]
+
+
+def generate(stream, lines, urls=1000, errors=0.0, date=None, seed=0):
+    rnd = random.Random(seed)
+    date = date or datetime.datetime(2017, 6, 29, 3, 50, 22)
+    pool = make_urls(urls, rnd)
+    # per-url latency scale, so that slow urls stay slow
+    scales = [rnd.lognormvariate(-2.0, 1.0) for __ in xrange(urls)]
+
+    for n in xrange(lines):
+        ip = '1.{}.{}.{}'.format(rnd.randint(0, 254), rnd.randint(0, 254), rnd.randint(1, 254))
+
+        if rnd.random() < errors:
+            stream.write('{} - garbage line\n'.format(ip))
+            continue
+
+        # zipf-like popularity: a few urls get most of the traffic, the rest is a long uniform tail
+        if rnd.random() < 0.3:
+            i = rnd.randrange(urls)
+        else:
+            i = (min(int(rnd.paretovariate(1.2)), urls) - 1) * 7919 % urls
+
+        stream.write(
+            '{ip} {user}  - [{ts:%d/%b/%Y:%H:%M:%S} +0300] "{method} {url} HTTP/1.1" {status} {size} "-" '
+            '"{ua}" "-" "{rid}" "{rbuser}" {rt:.3f}\n'.format(
+                ip=ip,
+                user=rnd.choice(('-', '3b81f63526fa8', '8d34d2e5e4c1')),
+                ts=date + datetime.timedelta(seconds=n / 20),
+                method=rnd.choice(('GET', 'GET', 'GET', 'POST')),
+                url=pool[i],
+                status=rnd.choice((200, 200, 200, 200, 404, 500)),
+                size=rnd.randint(0, 30000),
+                ua=rnd.choice(user_agents),
+                rid='{}-{}-4708-{}'.format(1498697422 + n / 20, rnd.randint(0, 1 << 31), 9752759 + n),
+                rbuser=rnd.choice(('-', 'dc7161be3', '712e90144abee9')),
+                rt=rnd.expovariate(1.0 / scales[i]),
+            )
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-o', '--output', required=True, help='log file to write')
+    parser.add_argument('-n', '--lines', default=100000, type=int, help='number of lines')
+    parser.add_argument('-u', '--urls', default=1000, type=int, help='number of distinct urls')
+    parser.add_argument('-e', '--errors', default=0.0, type=float, help='ratio of unparsable lines')
+    parser.add_argument('-z', '--gzip', action='store_true', help='gzip output')
+    parser.add_argument('-s', '--seed', default=0, type=int, help='random seed')
+    args = parser.parse_args()
+
+    opener = gzip.open if args.gzip else open
+
+    with opener(args.output, 'wb') as lf:
+        generate(lf, args.lines, urls=args.urls, errors=args.errors, seed=args.seed)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import gzip
+import json
+import shutil
+import logging
+import argparse
+import resource
+import tempfile
+import multiprocessing
+from log_analyzer import log_analyzer
+from log_analyzer.decorators import metrics
+from log_analyzer.columnar import np
+from log_analyzer.patterns import ui_log_file_name_re
+from benchmarks.generator import generate
+
+template = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'tests', 'integration', 'fixtures', 'reports', 'report.html'
+)
+
+variants = (
+    ('stream', {'BACKEND': 'stream'}),
+    ('sketch', {'BACKEND': 'stream', 'QUANTILES': 'sketch'}),
+    ('sqlite', {'BACKEND': 'sqlite'}),
+    ('numpy', {'BACKEND': 'numpy'}),
+)
+
+
+def run(name, config, log_dir, report_dir, results):
+    metrics.reset()
+
+    log_file = log_analyzer.find_latest(log_dir, ui_log_file_name_re, '%Y%m%d')
+    compressed = log_file.extension == '.gz'
+    report = os.path.join(report_dir, 'report-{}.html'.format(name))
+
+    with log_analyzer.aggregate_log(log_file.path, config, compressed=compressed) as aggregator:
+        lines = aggregator.requests_count
+        log_analyzer.render_report(template, report, log_analyzer.get_report_data(aggregator, config))
+
+    stages = metrics.stages
+    own = lambda stage: stages[stage]['own'] if stage in stages else 0.0
+
+    results.put({
+        'variant': name,
+        'lines': lines,
+        'lines_per_sec': lines / stages['aggregate_log']['duration'],
+        'find': own('find_latest'),
+        # with WORKERS > 1 lines are parsed in the workers and parsing is counted in aggregate
+        'parse': own('parse_log'),
+        'aggregate': own('aggregate_log') + own('fill_table'),
+        'render': stages['render_report']['duration'],
+        'peak_rss_mb': max(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        ) / 1024.0,
+    })
+
+
+def measure(name, config, log_dir, report_dir):
+    # every variant runs in a fresh process so that peak rss is its own; the process is not daemonic,
+    # so WORKERS > 1 can start its own pool
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=run, args=(name, config, log_dir, report_dir, results))
+    process.start()
+    process.join()
+
+    if process.exitcode:
+        raise RuntimeError('{} variant failed with exit code {}'.format(name, process.exitcode))
+
+    return results.get()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--lines', default=200000, type=int, help='number of generated lines')
+    parser.add_argument('-u', '--urls', default=10000, type=int, help='number of distinct urls')
+    parser.add_argument('-e', '--errors', default=0.01, type=float, help='ratio of unparsable lines')
+    parser.add_argument('-z', '--gzip', action='store_true', help='benchmark gzipped log')
+    parser.add_argument('-w', '--workers', default=1, type=int, help='WORKERS setting')
+    parser.add_argument('-v', '--variant', action='append', help='variants to run (default: all)')
+    parser.add_argument('-j', '--json', default=None, help='write metrics to json file')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    temp_dir = tempfile.mkdtemp()
+
+    try:
+        log_dir, report_dir = os.path.join(temp_dir, 'log'), os.path.join(temp_dir, 'reports')
+        os.mkdir(log_dir)
+        os.mkdir(report_dir)
+
+        log_file = os.path.join(log_dir, 'nginx-access-ui.log-20170630' + ('.gz' if args.gzip else ''))
+        with (gzip.open if args.gzip else open)(log_file, 'wb') as lf:
+            generate(lf, args.lines, urls=args.urls, errors=args.errors)
+
+        results = []
+        print '{:<8} {:>10} {:>12} {:>10} {:>8} {:>8} {:>10} {:>8}'.format(
+            'variant', 'lines', 'lines/sec', 'rss, MB', 'find', 'parse', 'aggregate', 'render'
+        )
+
+        for name, config in variants:
+            if args.variant and name not in args.variant or name == 'numpy' and not np:
+                continue
+            if name == 'sqlite' and args.workers > 1:
+                # sqlite aggregator can't merge partial results
+                continue
+
+            config = dict(config, WORKERS=args.workers, REPORT_SIZE=1000, ERROR_THRESHOLD=100)
+            result = measure(name, config, log_dir, report_dir)
+            results.append(result)
+
+            print '{variant:<8} {lines:>10} {lines_per_sec:>12,.0f} {peak_rss_mb:>10.1f} {find:>8.3f} ' \
+                  '{parse:>8.3f} {aggregate:>10.3f} {render:>8.3f}'.format(**result)
+
+        if args.json:
+            with open(args.json, 'w') as jf:
+                json.dump(results, jf, indent=2)
+    finally:
+        shutil.rmtree(temp_dir)
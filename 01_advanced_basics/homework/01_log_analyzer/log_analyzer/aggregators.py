@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+import heapq
+from array import array
+from sketches import KLLSketch, quantile, quantiles
+
+
+def median(values):
+    return quantile(values, 0.5)
+
+
+class Aggregator(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return self.close()
+
+    def close(self):
+        pass
+
+    def update(self, data):
+        raise NotImplementedError
+
+    def rename(self, mapping):
+        raise NotImplementedError
+
+    @property
+    def requests_count(self):
+        raise NotImplementedError
+
+    @property
+    def errors_count(self):
+        raise NotImplementedError
+
+    @property
+    def total_time(self):
+        raise NotImplementedError
+
+    def stats(self, limit=None, percentiles=()):
+        raise NotImplementedError
+
+
+class RequestsStat(object):
+    __slots__ = ('count', 'time_sum', 'time_max', 'samples')
+
+    def __init__(self, sketch_size=None):
+        self.count = 0
+        self.time_sum = 0
+        self.time_max = 0
+        self.samples = KLLSketch(k=sketch_size) if sketch_size else array('l')
+
+    def add(self, request_time):
+        self.count += 1
+        self.time_sum += request_time
+        self.samples.append(request_time)
+
+        if request_time > self.time_max:
+            self.time_max = request_time
+
+    def merge(self, other):
+        self.time_sum += other.time_sum
+        self.count += other.count
+        self.time_max = max(self.time_max, other.time_max)
+        self.samples.extend(other.samples)
+
+    def quantiles(self, qs):
+        if isinstance(self.samples, KLLSketch):
+            return self.samples.quantiles(qs)
+        else:
+            return quantiles(self.samples, qs)
+
+
+class StreamAggregator(Aggregator):
+    def __init__(self, sketch_size=None):
+        self.sketch_size = sketch_size
+        self.urls = {}
+
+    def update(self, data):
+        urls, sketch_size = self.urls, self.sketch_size
+
+        for url, request_time in data:
+            stat = urls.get(url)
+            if stat is None:
+                stat = urls[url] = RequestsStat(sketch_size)
+            stat.add(request_time)
+
+        return self
+
+    def merge(self, other):
+        urls, sketch_size = self.urls, self.sketch_size
+
+        for url, other_stat in other.urls.iteritems():
+            stat = urls.get(url)
+            if stat is None:
+                stat = urls[url] = RequestsStat(sketch_size)
+            stat.merge(other_stat)
+
+        return self
+
+    def rename(self, mapping):
+        urls = {}
+
+        for url, stat in self.urls.iteritems():
+            url = mapping.get(url, url)
+            target = urls.get(url)
+            if target is None:
+                urls[url] = stat
+            else:
+                target.merge(stat)
+
+        self.urls = urls
+        return self
+
+    @property
+    def requests_count(self):
+        return sum(stat.count for stat in self.urls.itervalues())
+
+    @property
+    def errors_count(self):
+        stat = self.urls.get(None)
+        return stat.count if stat else 0
+
+    @property
+    def total_time(self):
+        return sum(stat.time_sum for stat in self.urls.itervalues())
+
+    def stats(self, limit=None, percentiles=()):
+        key = lambda item: (-item[1].time_sum, item[0])
+
+        if limit:
+            # bounded heap: only REPORT_SIZE candidates are kept and only their samples get sorted
+            ranked = heapq.nsmallest(limit, self.urls.iteritems(), key=key)
+        else:
+            ranked = sorted(self.urls.iteritems(), key=key)
+
+        qs = (0.5, ) + tuple(p / 100.0 for p in percentiles)
+
+        for url, stat in ranked:
+            yield (url, stat.count, stat.time_sum, float(stat.time_sum) / stat.count, stat.time_max) + stat.quantiles(qs)
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+import os
+import errno
+import hashlib
+import logging
+import cPickle
+import tempfile
+
+
+class StateCache(object):
+    def __init__(self, directory, variant=''):
+        self.directory = directory
+        self.variant = variant
+
+    def path(self, file_path):
+        key = '{}\0{}'.format(os.path.abspath(file_path), self.variant)
+        return os.path.join(self.directory, '{}.state'.format(hashlib.md5(key).hexdigest()))
+
+    @staticmethod
+    def fingerprint(file_path):
+        stat = os.stat(file_path)
+        return stat.st_size, stat.st_mtime
+
+    def load(self, file_path):
+        try:
+            with open(self.path(file_path), 'rb') as cf:
+                fingerprint, state = cPickle.load(cf)
+        except IOError as e:
+            if e.errno != errno.ENOENT:
+                logging.warning('could not read cached state for {}: {}'.format(file_path, e))
+            return None
+        except (EOFError, ValueError, TypeError, AttributeError, ImportError, IndexError, KeyError,
+                cPickle.UnpicklingError) as e:
+            logging.warning('broken cached state for {}: {}'.format(file_path, e))
+            return None
+
+        if fingerprint != self.fingerprint(file_path):
+            return None
+
+        return state
+
+    def save(self, file_path, state):
+        try:
+            os.makedirs(self.directory)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+        with tempfile.NamedTemporaryFile(dir=self.directory, delete=False) as tf:
+            cPickle.dump((self.fingerprint(file_path), state), tf, cPickle.HIGHEST_PROTOCOL)
+
+        os.rename(tf.name, self.path(file_path))
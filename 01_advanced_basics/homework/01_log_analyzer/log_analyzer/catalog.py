@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+import time
+import errno
+import logging
+import cPickle
+import datetime
+import tempfile
+from collections import namedtuple
+
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+Entry = namedtuple('Entry', ['path', 'extension', 'date', 'size', 'mtime'])
+
+
+def list_dir(directory):
+    if scandir:
+        return [(entry.name, entry.path, entry.is_dir, entry.stat) for entry in scandir(directory)]
+
+    entries = []
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        entries.append((name, path, lambda path=path: os.path.isdir(path), lambda path=path: os.stat(path)))
+    return entries
+
+
+class LogCatalog(object):
+    # directories changed less than this many seconds before a scan are rescanned next time,
+    # a change within the same mtime tick would go unnoticed otherwise
+    settle = 2.0
+
+    def __init__(self, directory, sample, date_format, recursive=False):
+        self.directory = directory
+        self.regexp = re.compile(sample)
+        self.date_format = date_format
+        self.recursive = recursive
+        # directory -> (mtime, {name: Entry}, subdirectories)
+        self.dirs = {}
+
+    @property
+    def key(self):
+        return os.path.abspath(self.directory), self.regexp.pattern, self.date_format, self.recursive
+
+    def scan(self, directory, known):
+        files, subdirs = {}, []
+
+        for name, path, is_dir, stat in list_dir(directory):
+            match = self.regexp.match(name)
+
+            if is_dir():
+                if self.recursive:
+                    subdirs.append(path)
+            elif match:
+                stat = stat()
+                date = known[name].date if name in known else datetime.datetime.strptime(
+                    match.group('date'), self.date_format
+                )
+                files[name] = Entry(
+                    path=path, extension=match.group('extension'), date=date, size=stat.st_size, mtime=stat.st_mtime
+                )
+
+        return files, subdirs
+
+    def refresh(self):
+        dirs, pending = {}, [self.directory]
+
+        while pending:
+            directory = pending.pop()
+
+            try:
+                mtime = os.stat(directory).st_mtime
+            except OSError as e:
+                if e.errno not in (errno.ENOENT, errno.ENOTDIR):
+                    raise
+                continue
+
+            cached = self.dirs.get(directory)
+            if cached and cached[0] == mtime:
+                files, subdirs = cached[1], cached[2]
+            else:
+                files, subdirs = self.scan(directory, cached[1] if cached else {})
+
+            if time.time() - mtime < self.settle:
+                mtime = None
+
+            dirs[directory] = (mtime, files, subdirs)
+            pending.extend(subdirs)
+
+        self.dirs = dirs
+        return self
+
+    def files(self):
+        entries = [entry for __, files, __ in self.dirs.itervalues() for entry in files.itervalues()]
+        return sorted(entries, key=lambda entry: (entry.date, entry.path))
+
+    def load(self, cache_file):
+        try:
+            with open(cache_file, 'rb') as cf:
+                key, dirs = cPickle.load(cf)
+        except IOError as e:
+            if e.errno != errno.ENOENT:
+                logging.warning('could not read log catalog {}: {}'.format(cache_file, e))
+            return self
+        except (EOFError, ValueError, TypeError, cPickle.UnpicklingError) as e:
+            logging.warning('broken log catalog {}: {}'.format(cache_file, e))
+            return self
+
+        if key == self.key:
+            self.dirs = dirs
+
+        return self
+
+    def save(self, cache_file):
+        directory = os.path.dirname(os.path.abspath(cache_file))
+
+        with tempfile.NamedTemporaryFile(dir=directory, delete=False) as tf:
+            cPickle.dump((self.key, self.dirs), tf, cPickle.HIGHEST_PROTOCOL)
+
+        os.rename(tf.name, cache_file)
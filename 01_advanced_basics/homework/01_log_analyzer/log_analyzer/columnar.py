@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+import heapq
+from array import array
+from aggregators import Aggregator
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class ColumnarAggregator(Aggregator):
+    def __init__(self):
+        assert np is not None, 'numpy backend requires numpy'
+        self.ids = {}
+        self.urls = []
+        self.url_ids = array('i')
+        self.times = array('l')
+
+    def intern(self, url):
+        url_id = self.ids.get(url)
+        if url_id is None:
+            url_id = self.ids[url] = len(self.urls)
+            self.urls.append(url)
+        return url_id
+
+    def update(self, data):
+        ids, intern = self.ids, self.intern
+        url_ids, times = self.url_ids, self.times
+
+        for url, request_time in data:
+            url_id = ids.get(url)
+            url_ids.append(intern(url) if url_id is None else url_id)
+            times.append(request_time)
+
+        return self
+
+    def merge(self, other):
+        mapping = np.array([self.intern(url) for url in other.urls], dtype=np.int32)
+        other_ids = np.frombuffer(other.url_ids, dtype=np.int32) if other.url_ids else np.empty(0, np.int32)
+
+        self.url_ids.fromstring(mapping[other_ids].tostring())
+        self.times.extend(other.times)
+        return self
+
+    def rename(self, mapping):
+        renamed = ColumnarAggregator()
+        ids = np.array([renamed.intern(mapping.get(url, url)) for url in self.urls], dtype=np.int32)
+        url_ids, __ = self.columns()
+
+        renamed.url_ids.fromstring(ids[url_ids].tostring())
+        renamed.times = self.times
+        return renamed
+
+    def columns(self):
+        if not self.times:
+            return np.empty(0, np.int32), np.empty(0, 'l')
+        return np.frombuffer(self.url_ids, dtype=np.int32), np.frombuffer(self.times, dtype='l')
+
+    @property
+    def requests_count(self):
+        return len(self.times)
+
+    @property
+    def errors_count(self):
+        if None not in self.ids:
+            return 0
+        url_ids, __ = self.columns()
+        return int(np.count_nonzero(url_ids == self.ids[None]))
+
+    @property
+    def total_time(self):
+        __, times = self.columns()
+        return int(np.sum(times))
+
+    def stats(self, limit=None, percentiles=()):
+        url_ids, times = self.columns()
+        groups = len(self.urls)
+
+        counts = np.bincount(url_ids, minlength=groups)
+
+        # group rows by url id once and add up the int64 times of every group
+        grouped = np.argsort(url_ids, kind='mergesort')
+        grouped_ids, grouped_times = url_ids[grouped], times[grouped]
+        group_starts = np.cumsum(counts) - counts
+        present = counts > 0
+
+        sums = np.zeros(groups, dtype=np.int64)
+        if grouped_times.size:
+            sums[present] = np.add.reduceat(grouped_times, group_starts[present])
+        sums = sums.tolist()
+
+        key = lambda url_id: (-sums[url_id], self.urls[url_id])
+        if limit:
+            top = heapq.nsmallest(limit, xrange(groups), key=key)
+        else:
+            top = sorted(xrange(groups), key=key)
+
+        if not top:
+            return
+
+        # sort only the rows of the selected urls: by url id, then by time
+        selected = np.zeros(groups, dtype=bool)
+        selected[top] = True
+        rows = selected[grouped_ids]
+        row_ids, row_times = grouped_ids[rows], grouped_times[rows]
+        order = np.lexsort((row_times, row_ids))
+        row_times = row_times[order]
+
+        top = np.array(top, dtype=np.int64)
+        top_counts = counts[top]
+        ends = np.cumsum(counts * selected)
+        starts = ends[top] - top_counts
+
+        maxs = row_times[starts + top_counts - 1]
+        quantiles = [
+            interpolate(row_times, starts, top_counts, q) for q in (0.5, ) + tuple(p / 100.0 for p in percentiles)
+        ]
+
+        for i, url_id in enumerate(top.tolist()):
+            count = int(top_counts[i])
+            yield (self.urls[url_id], count, sums[url_id], float(sums[url_id]) / count, int(maxs[i])) + \
+                tuple(float(values[i]) for values in quantiles)
+
+
+def interpolate(row, starts, counts, q):
+    pos = (counts - 1) * q
+    lo = np.floor(pos).astype(np.int64)
+    frac = pos - lo
+    hi = np.minimum(lo + 1, counts - 1)
+
+    low, high = row[starts + lo], row[starts + hi]
+    return np.where(frac == 0, low, low * (1 - frac) + high * frac)
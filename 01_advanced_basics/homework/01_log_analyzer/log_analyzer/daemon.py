@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import errno
+
+
+def file_state(path):
+    try:
+        stat = os.stat(path)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+        return None
+
+    return stat.st_size, stat.st_mtime
+
+
+class LogWatcher(object):
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.done = set()
+        # path -> (size, mtime) seen by the previous poll
+        self.states = {}
+
+    def skip_history(self):
+        # like a cron run, start from the latest log and leave the older ones alone
+        files = self.catalog.refresh().files()
+        if not files:
+            return
+
+        latest = files[-1].date
+        for entry in files:
+            if entry.date < latest:
+                self.done.add(entry.path)
+            else:
+                self.states[entry.path] = file_state(entry.path)
+
+    def poll(self):
+        # a file is ready once its size and mtime are the same on two polls in a row,
+        # so a log that is still being compressed or copied waits for the next poll;
+        # files are stat'ed directly, the catalog only notices added and removed names
+        ready, states = [], {}
+
+        for entry in self.catalog.refresh().files():
+            if entry.path in self.done:
+                continue
+
+            state = file_state(entry.path)
+            if state is None:
+                continue
+
+            if self.states.get(entry.path) == state:
+                ready.append(entry)
+            states[entry.path] = state
+
+        self.states = states
+        return ready
+
+    def mark(self, entry):
+        self.done.add(entry.path)
+        self.states.pop(entry.path, None)
+
+    def backlog(self):
+        return sorted(self.states.iteritems())
+
+
+def format_time(timestamp):
+    return time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(timestamp)) if timestamp else None
+
+
+class DaemonStatus(object):
+    def __init__(self, started):
+        self.started = started
+        self.processed = 0
+        self.failed = 0
+        self.lines = 0
+        self.busy = 0.0
+        self.last = None
+        self.last_error = None
+
+    def success(self, path, lines, duration, report, now):
+        self.processed += 1
+        self.lines += lines
+        self.busy += duration
+        self.last = {
+            'path': path,
+            'report': report,
+            'lines': lines,
+            'seconds': round(duration, 3),
+            'lines_per_sec': int(round(lines / duration)) if duration else None,
+            'finished': format_time(now),
+        }
+
+    def failure(self, path, error, now):
+        self.failed += 1
+        self.last_error = {'path': path, 'error': str(error), 'time': format_time(now)}
+
+    def as_dict(self, backlog, now):
+        return {
+            'started': format_time(self.started),
+            'updated': format_time(now),
+            'uptime': round(now - self.started, 3),
+            'processed_files': self.processed,
+            'failed_files': self.failed,
+            'lines': self.lines,
+            'busy_seconds': round(self.busy, 3),
+            'lines_per_sec': int(round(self.lines / self.busy)) if self.busy else None,
+            'last': self.last,
+            'last_error': self.last_error,
+            'backlog_files': len(backlog),
+            'backlog_bytes': sum(size for __, (size, __) in backlog),
+            'backlog': [path for path, __ in backlog],
+        }
@@ -1,6 +1,12 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
+import json
 import time
+import inspect
+import itertools
+import resource
+from functools import wraps
+from collections import OrderedDict
 
 
 def catcher(logger, exceptions=None):
@@ -18,3 +24,102 @@ def catcher(logger, exceptions=None):
             return result
         return wrapped
     return decorator
+
+
+def peak_rss():
+    # ru_maxrss is in kilobytes on linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+class Metrics(object):
+    def __init__(self):
+        self.stages = OrderedDict()
+        self.stack = []
+
+    def reset(self):
+        self.stages.clear()
+        del self.stack[:]
+
+    def enter(self):
+        self.stack.append(0.0)
+
+    def exit(self, duration):
+        nested = self.stack.pop()
+        if self.stack:
+            self.stack[-1] += duration
+        return duration - nested
+
+    def record(self, stage, duration, own, items=None):
+        metric = self.stages.setdefault(stage, {'calls': 0, 'duration': 0.0, 'own': 0.0, 'items': None})
+        metric['calls'] += 1
+        metric['duration'] += duration
+        metric['own'] += own
+        metric['peak_rss_mb'] = peak_rss()
+
+        if items is not None:
+            metric['items'] = (metric['items'] or 0) + items
+            metric['items_per_sec'] = metric['items'] / metric['own'] if metric['own'] else None
+
+        return metric
+
+    def dump(self, path):
+        with open(path, 'w') as mf:
+            json.dump({'stages': self.stages, 'peak_rss_mb': peak_rss()}, mf, indent=2)
+
+
+metrics = Metrics()
+
+
+def timed(logger, stage=None, registry=None, chunk_size=1024):
+    registry = registry or metrics
+
+    def report(name, duration, own, items=None):
+        metric = registry.record(name, duration, own, items)
+        message = 'stage {}: {:.3f}s (own {:.3f}s)'.format(name, duration, own)
+        if items is not None:
+            message += ', {} items, {:.0f} items/s'.format(items, items / own if own else 0)
+        logger.info('{}, peak rss {:.1f} MB'.format(message, metric['peak_rss_mb']))
+
+    def decorator(func):
+        name = stage or func.__name__
+
+        if inspect.isgeneratorfunction(func):
+            @wraps(func)
+            def wrapped(*args, **kwargs):
+                # only the time spent inside the generator is counted, not the time of its consumer;
+                # items are pulled in chunks to keep clock calls off the per-item path
+                clock, items, duration, nested = time.time, 0, 0.0, 0.0
+                iterator = func(*args, **kwargs)
+
+                try:
+                    while True:
+                        registry.enter()
+                        started = clock()
+                        try:
+                            chunk = list(itertools.islice(iterator, chunk_size))
+                        finally:
+                            elapsed = clock() - started
+                            duration += elapsed
+                            nested += elapsed - registry.exit(elapsed)
+
+                        if not chunk:
+                            break
+
+                        items += len(chunk)
+                        for item in chunk:
+                            yield item
+                finally:
+                    report(name, duration, duration - nested, items)
+        else:
+            @wraps(func)
+            def wrapped(*args, **kwargs):
+                registry.enter()
+                started = time.time()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    duration = time.time() - started
+                    report(name, duration, registry.exit(duration))
+
+        return wrapped
+    return decorator
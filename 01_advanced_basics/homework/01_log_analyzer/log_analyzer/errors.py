@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+import math
+
+
+def wilson_interval(errors, total, z):
+    if not total:
+        return 0.0, 1.0
+
+    p = float(errors) / total
+    denominator = 1 + z * z / total
+    center = p + z * z / (2 * total)
+    margin = z * math.sqrt(p * (1 - p) / total + z * z / (4 * total * total))
+
+    return max((center - margin) / denominator, 0.0), min((center + margin) / denominator, 1.0)
+
+
+class ErrorRateGuard(object):
+    # z = 3.29 puts the lower bound at ~99.95% one-sided confidence
+    def __init__(self, threshold, min_sample=10000, z=3.29, check_every=1024):
+        self.threshold = threshold
+        self.min_sample = min_sample
+        self.z = z
+        self.check_every = check_every
+
+    def exceeded(self, errors, total):
+        if not self.min_sample or total < self.min_sample:
+            return False
+
+        return wilson_interval(errors, total, self.z)[0] * 100 >= self.threshold
+
+    def check(self, errors, total):
+        assert not self.exceeded(errors, total), 'could not parse more than {}% of logs: {} of {} lines'.format(
+            self.threshold, errors, total
+        )
+
+    def __call__(self, data):
+        errors, total, check_at = 0, 0, self.min_sample
+
+        for item in data:
+            total += 1
+            if item[0] is None:
+                errors += 1
+            if total == check_at:
+                self.check(errors, total)
+                check_at += self.check_every
+            yield item
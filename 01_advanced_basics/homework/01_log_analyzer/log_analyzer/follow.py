@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+import io
+import os
+import errno
+from collections import deque
+
+
+class LogFollower(object):
+    def __init__(self, path, from_end=True):
+        self.path = path
+        self.from_end = from_end
+        self.file = None
+        self.tail = ''
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def open(self, from_end):
+        try:
+            self.file = io.open(self.path, 'rb')
+        except IOError as e:
+            if e.errno != errno.ENOENT:
+                raise
+            return False
+
+        if from_end:
+            self.file.seek(0, os.SEEK_END)
+
+        return True
+
+    def rotated(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+            return False
+
+        return stat.st_ino != os.fstat(self.file.fileno()).st_ino
+
+    def read(self):
+        if not self.file:
+            opened = self.open(from_end=self.from_end)
+            # only a log that existed when following started is skipped, one that appears later is read whole
+            self.from_end = False
+            if not opened:
+                return []
+
+        if os.fstat(self.file.fileno()).st_size < self.file.tell():
+            # truncated in place (copytruncate), the unfinished line is gone with the old content
+            self.file.seek(0)
+            self.tail = ''
+
+        lines = (self.tail + self.file.read()).split('\n')
+        self.tail = lines.pop()
+
+        if self.rotated():
+            # the old file is drained, continue with the new one from its beginning
+            if self.tail:
+                lines.append(self.tail)
+                self.tail = ''
+            self.close()
+            self.open(from_end=False)
+
+        return lines
+
+
+class SlidingWindow(object):
+    def __init__(self, span, factory, bucket=60):
+        self.span = span
+        self.factory = factory
+        self.bucket = bucket
+        self.buckets = deque()
+
+    def expire(self, now):
+        while self.buckets and self.buckets[0][0] < now - self.span:
+            self.buckets.popleft()
+
+    def update(self, data, now):
+        start = int(now // self.bucket) * self.bucket
+
+        if not self.buckets or self.buckets[-1][0] != start:
+            self.buckets.append((start, self.factory()))
+
+        self.buckets[-1][1].update(data)
+        self.expire(now)
+
+    def aggregate(self, window, now):
+        aggregator = self.factory()
+
+        for start, bucket in self.buckets:
+            if start >= now - window:
+                aggregator.merge(bucket)
+
+        return aggregator
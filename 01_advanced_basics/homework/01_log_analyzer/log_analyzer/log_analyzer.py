@@ -1,21 +1,34 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 import os
-import re
 import sys
+import mmap
+import time
 import json
 import copy
-import gzip
-import shutil
 import sqlite3
 import logging
+import contextlib
 import argparse
 import datetime
 import tempfile
+import itertools
+import multiprocessing
 from string import Template
-from collections import namedtuple
-from decorators import catcher
-from patterns import ui_log_file_name_re, ui_log_string_re
+from collections import namedtuple, deque
+from decorators import catcher, timed, metrics
+from aggregators import Aggregator, StreamAggregator, median
+from sketches import quantile
+from cache import StateCache
+from catalog import LogCatalog
+from follow import LogFollower, SlidingWindow
+from daemon import LogWatcher, DaemonStatus
+from normalizers import UrlNormalizer, id_rules, track_urls
+from readers import read_gzip
+from columnar import ColumnarAggregator
+from errors import ErrorRateGuard
+from patterns import ui_log_file_name_re, ui_log_string_re, ui_log_string_fast, ui_log_format, compile_log_format, \
+    parse_request_time, time_scale
 
 # log_format ui_short '$remote_addr  $remote_user $http_x_real_ip [$time_local] "$request" '
 #                     '$status $body_bytes_sent "$http_referer" '
@@ -28,44 +41,128 @@ config = {
     "LOG_DIR": "./log",
 }
 
+parsers = {
+    'fast': ui_log_string_fast,
+    'regex': ui_log_string_re,
+    'format': compile_log_format(ui_log_format),
+}
+
+File = namedtuple('File', ['path', 'extension', 'date'])
+
+
+def list_logs(catalog, sample, date_format, recursive=False, cache_file=None):
+    logs = LogCatalog(catalog, sample, date_format, recursive=recursive)
+
+    if cache_file:
+        logs.load(cache_file)
+
+    logs.refresh()
+
+    if cache_file:
+        logs.save(cache_file)
+
+    return [File(path=entry.path, extension=entry.extension, date=entry.date) for entry in logs.files()]
+
 
 @catcher(logger=logging)
-def find_latest(catalog, sample, date_format):
-    File = namedtuple('File', ['path', 'extension', 'date'])
-    latest_file, latest_dt = None, None
-    regexp = re.compile(sample)
-
-    for root, __, files in os.walk(catalog):
-        for file_name in files:
-            match = regexp.match(file_name)
-            if match:
-                dt, extension = match.group('date'), match.group('extension')
-                dt = datetime.datetime.strptime(dt, date_format)
+@timed(logger=logging)
+def find_latest(catalog, sample, date_format, recursive=False, cache_file=None):
+    latest_file = None
 
-                if not latest_dt or latest_dt < dt:
-                    latest_dt = dt
-                    latest_file = File(
-                        path=os.path.join(root, file_name),
-                        extension=extension,
-                        date=dt
-                    )
+    for log_file in list_logs(catalog, sample, date_format, recursive=recursive, cache_file=cache_file):
+        if not latest_file or latest_file.date < log_file.date:
+            latest_file = log_file
 
     return latest_file
 
 
 @catcher(logger=logging)
-def parse_log(file_path, pattern, compressed=False):
-    opener = gzip.open if compressed else open
+def find_logs(catalog, sample, date_format, since=None, until=None, recursive=False, cache_file=None):
+    logs = []
+
+    for log_file in list_logs(catalog, sample, date_format, recursive=recursive, cache_file=cache_file):
+        if (since and log_file.date < since) or (until and log_file.date > until):
+            continue
+        if logs and logs[-1].date == log_file.date:
+            continue
+        logs.append(log_file)
+
+    return logs
+
+
+def parse_lines(lines, pattern):
+    for line in lines:
+        match = pattern.match(line)
+        if match:
+            url, request_time = match.group('url'), parse_request_time(match.group('request_time'))
+        else:
+            url, request_time = None, 0
+        yield url, request_time
+
+
+def parse_mapped(file_path, pattern, start=0, end=None):
+    with open(file_path, 'rb') as lf:
+        size = os.fstat(lf.fileno()).st_size
+        if not size:
+            return
+
+        buf = mmap.mmap(lf.fileno(), 0, access=mmap.ACCESS_READ)
 
-    with opener(file_path, 'rb') as lf:
-        for line in lf:
-            match = pattern.match(line)
+    try:
+        pos, end = start, size if end is None else end
+
+        while pos < end:
+            eol = buf.find('\n', pos)
+            if eol < 0:
+                eol = size
+
+            match = pattern.match(buf, pos, eol)
             if match:
-                url, request_time = match.group('url'), match.group('request_time')
+                url, request_time = match.group('url'), parse_request_time(match.group('request_time'))
             else:
-                url, request_time = None, '0.0'
+                url, request_time = None, 0
             yield url, request_time
 
+            pos = eol + 1
+    finally:
+        buf.close()
+
+
+@catcher(logger=logging)
+@timed(logger=logging)
+def parse_log(file_path, pattern, compressed=False, reader='auto'):
+    if not compressed:
+        for parsed in parse_mapped(file_path, pattern):
+            yield parsed
+        return
+
+    for parsed in parse_lines(read_gzip(file_path, reader=reader), pattern):
+        yield parsed
+
+
+def split_log(file_path, chunks):
+    size = os.path.getsize(file_path)
+    bounds = [0]
+
+    with open(file_path, 'rb') as lf:
+        for i in xrange(1, chunks):
+            lf.seek(size * i / chunks)
+            lf.readline()
+            bounds.append(max(lf.tell(), bounds[-1]))
+
+    bounds.append(size)
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if start < end]
+
+
+def read_batches(file_path, size, reader='auto'):
+    lines = read_gzip(file_path, reader=reader)
+
+    while True:
+        batch = list(itertools.islice(lines, size))
+        if not batch:
+            break
+        yield batch
+
 
 class Median(object):
     def __init__(self):
@@ -75,13 +172,20 @@ class Median(object):
         self.row.append(value)
 
     def finalize(self):
-        length = len(self.row)
-        row = sorted(self.row)
+        return median(self.row)
 
-        if length % 2:
-            return row[length / 2]
-        else:
-            return (row[length / 2 - 1] + row[length / 2]) / 2.0
+
+class Percentile(object):
+    def __init__(self):
+        self.row = []
+        self.q = None
+
+    def step(self, value, q):
+        self.row.append(value)
+        self.q = q
+
+    def finalize(self):
+        return quantile(self.row, self.q)
 
 
 class SQLiteFactory(sqlite3.Connection):
@@ -95,12 +199,14 @@ class SQLiteFactory(sqlite3.Connection):
 def connect_to_db():
     conn = sqlite3.connect(":memory:", factory=SQLiteFactory)
     conn.create_aggregate('median', 1, Median)
+    conn.create_aggregate('percentile', 2, Percentile)
     conn.text_factory = str
-    conn.execute('CREATE TABLE requests (url TEXT, request_time REAL)')
+    conn.execute('CREATE TABLE requests (url TEXT, request_time INTEGER)')
 
     return conn
 
 
+@timed(logger=logging)
 def fill_table(conn, data):
     conn.executemany("INSERT INTO requests (url, request_time) VALUES (?, ?)", data)
 
@@ -129,61 +235,422 @@ def get_total_time(conn):
     return result[0]
 
 
-def get_requests_stats(conn, limit=None):
+@timed(logger=logging)
+def get_requests_stats(conn, limit=None, percentiles=()):
+    columns = ''.join(', PERCENTILE(request_time, {})'.format(p / 100.0) for p in percentiles)
+
+    if limit:
+        for stat in get_top_requests_stats(conn, limit, columns):
+            yield stat
+        return
+
     query = """SELECT url, 
                       COUNT(*), 
                       SUM(request_time), 
                       AVG(request_time), 
                       MAX(request_time), 
-                      MEDIAN(request_time)
-                      FROM requests GROUP BY url ORDER BY 3 DESC"""
-
-    if limit:
-        query += ' LIMIT {}'.format(limit)
+                      MEDIAN(request_time){}
+                      FROM requests GROUP BY url ORDER BY 3 DESC""".format(columns)
 
     for stat in conn.execute(query):
         yield stat
 
 
-def aggr_requests_stat(stat, total_time, total_count):
-    stats = []
+def get_top_requests_stats(conn, limit, columns=''):
+    # pick the top urls first so that medians are computed only for them
+    query = """SELECT url, 
+                      COUNT(*), 
+                      SUM(request_time), 
+                      AVG(request_time), 
+                      MAX(request_time)
+                      FROM requests GROUP BY url ORDER BY 3 DESC LIMIT ?"""
+    top = conn.execute(query, (limit, )).fetchall()
+
+    conn.execute('CREATE TEMP TABLE top_urls (url TEXT PRIMARY KEY)')
+    try:
+        conn.executemany('INSERT INTO top_urls (url) VALUES (?)', [(stat[0], ) for stat in top])
+        query = """SELECT url, 
+                          MEDIAN(request_time){}
+                          FROM requests 
+                          WHERE url IN top_urls OR (url IS NULL AND EXISTS (SELECT 1 FROM top_urls WHERE url IS NULL))
+                          GROUP BY url""".format(columns)
+        quantiles = dict((row[0], row[1:]) for row in conn.execute(query))
+    finally:
+        conn.execute('DROP TABLE top_urls')
+
+    for stat in top:
+        yield stat + quantiles[stat[0]]
+
+
+class SQLiteAggregator(Aggregator):
+    def __init__(self):
+        self.conn = connect_to_db()
+
+    def close(self):
+        self.conn.close()
+
+    def update(self, data):
+        fill_table(conn=self.conn, data=data)
+        return self
+
+    @property
+    def requests_count(self):
+        return get_requests_count(self.conn)
+
+    @property
+    def errors_count(self):
+        return get_errors_count(self.conn)
+
+    @property
+    def total_time(self):
+        return get_total_time(self.conn)
+
+    def stats(self, limit=None, percentiles=()):
+        return get_requests_stats(conn=self.conn, limit=limit, percentiles=percentiles)
+
+
+backends = {
+    'stream': StreamAggregator,
+    'sqlite': SQLiteAggregator,
+    'numpy': ColumnarAggregator,
+}
+
+
+def create_aggregator(config):
+    backend = config.get('BACKEND', 'stream')
+    assert backend in backends, 'unknown backend: {}'.format(backend)
+
+    if config.get('QUANTILES', 'exact') == 'sketch':
+        assert backend == 'stream', 'quantile sketches are supported by stream backend only'
+        return StreamAggregator(sketch_size=config.get('SKETCH_SIZE', 200))
+
+    return backends[backend]()
+
+
+def get_percentiles(config):
+    default = [50, 95, 99] if config.get('QUANTILES', 'exact') == 'sketch' else []
+    return tuple(config.get('PERCENTILES', default))
+
+
+def create_normalizer(config, cap=True):
+    normalization = config.get('URL_NORMALIZATION')
+    if not normalization:
+        return None
+
+    rules = list(id_rules) if normalization.get('COLLAPSE_IDS') else []
+    rules.extend(normalization.get('RULES', []))
+
+    return UrlNormalizer(
+        strip_query=normalization.get('STRIP_QUERY', False),
+        rules=rules,
+        max_urls=normalization.get('MAX_URLS') if cap else None,
+        other=normalization.get('OTHER', 'OTHER')
+    )
+
+
+def normalize(data, normalizer):
+    return normalizer(data) if normalizer else data
+
+
+def create_error_guard(config):
+    min_sample = config.get('ERROR_MIN_SAMPLE', 10000)
+    if not min_sample:
+        return None
+
+    return ErrorRateGuard(config.get('ERROR_THRESHOLD', 50), min_sample=min_sample, z=config.get('ERROR_Z', 3.29))
+
+
+def guard_errors(data, guard):
+    return guard(data) if guard else data
+
+
+def aggregate_partial(data, config):
+    # the distinct url cap has to follow the log order: workers only record the order urls first show up in,
+    # the cap itself is applied by the parent while merging
+    normalizer = create_normalizer(config, cap=False)
+    data, order = normalize(guard_errors(data, create_error_guard(config)), normalizer), None
+
+    if normalizer and config['URL_NORMALIZATION'].get('MAX_URLS'):
+        order = []
+        data = track_urls(data, order)
+
+    return create_aggregator(config).update(data), order
+
+
+def merge_partial(aggregator, result, normalizer):
+    partial, order = result
+
+    if order is not None:
+        partial = partial.rename(dict((url, normalizer.cap(url)) for url in order))
+
+    return aggregator.merge(partial)
+
+
+def aggregate_chunk(args):
+    file_path, start, end, pattern, config = args
+    return aggregate_partial(parse_mapped(file_path, pattern, start, end), config)
+
+
+def aggregate_batch(args):
+    lines, pattern, config = args
+    return aggregate_partial(parse_lines(lines, pattern), config)
+
+
+def aggregate_parallel(aggregator, file_path, pattern, config, compressed=False):
+    assert hasattr(aggregator, 'merge'), 'parallel parsing is not supported by {} backend'.format(
+        config.get('BACKEND', 'stream')
+    )
+    workers = config['WORKERS']
+    normalizer = create_normalizer(config)
+    # workers check their own part, the parent checks the merged counts, which matters for small batches
+    guard = create_error_guard(config)
+    pool = multiprocessing.Pool(workers)
+
+    def merge(result):
+        merge_partial(aggregator, result, normalizer)
+        if guard:
+            guard.check(aggregator.errors_count, aggregator.requests_count)
+
+    try:
+        if not compressed:
+            chunks = split_log(file_path, workers)
+            tasks = ((file_path, start, end, pattern, config) for start, end in chunks)
+
+            for result in pool.imap(aggregate_chunk, tasks):
+                merge(result)
+        else:
+            pending = deque()
+            reader = config.get('GZIP_READER', 'auto')
+
+            for batch in read_batches(file_path, config.get('BATCH_SIZE', 100000), reader=reader):
+                if len(pending) >= 2 * workers:
+                    merge(pending.popleft().get())
+                pending.append(pool.apply_async(aggregate_batch, ((batch, pattern, config), )))
+
+            while pending:
+                merge(pending.popleft().get())
+    except Exception:
+        pool.terminate()
+        raise
+    finally:
+        pool.close()
+        pool.join()
+
+    return aggregator
+
+
+def get_pattern(config):
+    if config.get('LOG_FORMAT'):
+        return compile_log_format(config['LOG_FORMAT'])
+
+    parser = config.get('PARSER', 'format')
+    assert parser in parsers, 'unknown parser: {}'.format(parser)
+    return parsers[parser]
+
+
+def get_state_cache(config):
+    if not config.get('CACHE_DIR'):
+        return None
+
+    assert config.get('BACKEND', 'stream') == 'stream', 'state cache is supported by stream backend only'
+    # exact quantiles keep every request_time, a cached state would grow with the log
+    assert config.get('QUANTILES', 'exact') == 'sketch', 'state cache requires QUANTILES=sketch'
+
+    quantiles = 'sketch:{}'.format(config.get('SKETCH_SIZE', 200))
+
+    normalization = json.dumps(config.get('URL_NORMALIZATION'), sort_keys=True)
+    parser = json.dumps(config.get('LOG_FORMAT')) if config.get('LOG_FORMAT') else config.get('PARSER', 'format')
+    variant = '{}:{}:{}:usec'.format(quantiles, parser, normalization)
+    return StateCache(config['CACHE_DIR'], variant=variant)
+
+
+@timed(logger=logging)
+def aggregate_log(file_path, config, compressed=False, cache=None):
+    if cache:
+        aggregator = cache.load(file_path)
+        if aggregator:
+            logging.info('using cached state for {}'.format(file_path))
+            return aggregator
+
+    pattern = get_pattern(config)
+    aggregator = create_aggregator(config)
+
+    try:
+        if config.get('WORKERS', 1) > 1:
+            aggregate_parallel(aggregator, file_path, pattern, config, compressed=compressed)
+        else:
+            data = parse_log(
+                file_path=file_path, pattern=pattern, compressed=compressed, reader=config.get('GZIP_READER', 'auto')
+            )
+            aggregator.update(normalize(guard_errors(data, create_error_guard(config)), create_normalizer(config)))
+    except Exception:
+        aggregator.close()
+        raise
 
-    for url, count, time_sum, time_avg, time_max, time_med in stat:
-        stats.append(
-            {
-                'url': url,
-                'count': count,
-                'time_sum': round(time_sum, 3),
-                'time_avg': round(time_avg, 3),
-                'time_max': round(time_max, 3),
-                'time_med': round(time_med, 3),
-                'time_perc': round(time_sum * 100.0 / total_time, 3),
-                'count_perc': round(count * 100.0 / total_count, 3)
-            }
-        )
+    if cache:
+        cache.save(file_path, aggregator)
 
-    return stats
+    return aggregator
 
 
+def aggregate_daily(args):
+    log_file, config = args
+    compressed = log_file.extension == '.gz'
+    return aggregate_log(log_file.path, config, compressed=compressed, cache=get_state_cache(config))
+
+
+def aggregate_logs(log_files, config):
+    assert config.get('BACKEND', 'stream') == 'stream', 'rollups are supported by stream backend only'
+    workers = min(config.get('WORKERS', 1), len(log_files))
+    tasks = [(log_file, dict(config, WORKERS=1)) for log_file in log_files]
+    aggregator = create_aggregator(config)
+
+    if workers < 2:
+        for result in itertools.imap(aggregate_daily, tasks):
+            aggregator.merge(result)
+        return aggregator
+
+    pool = multiprocessing.Pool(workers)
+
+    try:
+        for result in pool.imap(aggregate_daily, tasks):
+            aggregator.merge(result)
+    finally:
+        pool.close()
+        pool.join()
+
+    return aggregator
+
+
+def iter_requests_stat(stat, total_time, total_count, percentiles=()):
+    for row in stat:
+        url, count, time_sum, time_avg, time_max, time_med = row[:6]
+        # times are integer microseconds up to here
+        aggr = {
+            'url': url,
+            'count': count,
+            'time_sum': round(float(time_sum) / time_scale, 3),
+            'time_avg': round(float(time_avg) / time_scale, 3),
+            'time_max': round(float(time_max) / time_scale, 3),
+            'time_med': round(float(time_med) / time_scale, 3),
+            'time_perc': round(time_sum * 100.0 / total_time, 3),
+            'count_perc': round(count * 100.0 / total_count, 3)
+        }
+
+        for p, value in zip(percentiles, row[6:]):
+            aggr['time_p{}'.format(p)] = round(float(value) / time_scale, 3)
+
+        yield aggr
+
+
+def aggr_requests_stat(stat, total_time, total_count, percentiles=()):
+    return list(iter_requests_stat(stat, total_time, total_count, percentiles))
+
+
+def get_report_data(aggregator, config):
+    total_count = aggregator.requests_count
+    total_time = aggregator.total_time
+    errors_count = aggregator.errors_count
+
+    errors_perc = errors_count * 100.0 / total_count
+    threshold = config.get('ERROR_THRESHOLD', 50)
+    assert errors_perc < threshold, 'could not parse more than {}% of logs'.format(threshold)
+
+    percentiles = get_percentiles(config)
+    stat = aggregator.stats(limit=config.get('REPORT_SIZE'), percentiles=percentiles)
+    # rows are produced lazily, render them before the aggregator is closed
+    return iter_requests_stat(stat=stat, total_time=total_time, total_count=total_count, percentiles=percentiles)
+
+
+@contextlib.contextmanager
+def replace_file(dst):
+    # write next to the destination and rename, so readers never see a partial report
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(os.path.abspath(dst)), prefix='.report-', delete=False) as tf:
+        try:
+            yield tf
+        except Exception:
+            tf.close()
+            os.unlink(tf.name)
+            raise
+
+    umask = os.umask(0)
+    os.umask(umask)
+    os.chmod(tf.name, 0o666 & ~umask)
+    os.rename(tf.name, dst)
+
+
+@timed(logger=logging)
 def render_template(src, dst, data):
     with open(src, 'r') as sf:
         template = sf.read()
 
-    with tempfile.NamedTemporaryFile(delete=False) as tf:
+    with replace_file(dst) as tf:
         tf.write(Template(template).safe_substitute(data))
 
-    shutil.copyfile(tf.name, dst)
-    os.unlink(tf.name)
+
+def split_template(template, name):
+    matches = [
+        match for match in Template.pattern.finditer(template) if name in (match.group('named'), match.group('braced'))
+    ]
+
+    if not matches:
+        raise ValueError('template has no ${} placeholder'.format(name))
+    # rows are streamed once, so they can't be written at a second placeholder
+    if len(matches) > 1:
+        raise ValueError('template has {} ${} placeholders, only one is supported'.format(len(matches), name))
+
+    head, tail = template[:matches[0].start()], template[matches[0].end():]
+    return Template(head).safe_substitute(), Template(tail).safe_substitute()
+
+
+@timed(logger=logging)
+def render_report(src, dst, rows, name='table_json'):
+    with open(src, 'r') as sf:
+        head, tail = split_template(sf.read(), name)
+
+    with replace_file(dst) as tf:
+        tf.write(head)
+        tf.write('[')
+
+        # same separators as json.dumps of the whole list
+        for i, row in enumerate(rows):
+            if i:
+                tf.write(', ')
+            tf.write(json.dumps(row))
+
+        tf.write(']')
+        tf.write(tail)
+
+
+def save_metrics(config):
+    if config.get('METRICS_FILE'):
+        metrics.dump(config['METRICS_FILE'])
+
+
+def analyze_log(log_file, config, template, report, cache=None):
+    compressed = log_file.extension == '.gz'
+
+    with aggregate_log(log_file.path, config, compressed=compressed, cache=cache) as aggregator:
+        lines = aggregator.requests_count
+        render_report(src=template, dst=report, rows=get_report_data(aggregator, config))
+
+    return lines
 
 
 @catcher(logger=logging)
 def main(**kwargs):
     work_dir = os.path.abspath(os.path.dirname(__file__))
+    metrics.reset()
+
+    if kwargs.get('CACHE_DIR'):
+        kwargs = dict(kwargs, QUANTILES=kwargs.get('QUANTILES', 'sketch'))
 
     log_file = find_latest(
         catalog=kwargs.get('LOG_DIR', work_dir),
         sample=ui_log_file_name_re,
-        date_format='%Y%m%d'
+        date_format='%Y%m%d',
+        recursive=kwargs.get('LOG_DIR_RECURSIVE', False),
+        cache_file=kwargs.get('CATALOG_FILE')
     )
 
     if not log_file:
@@ -207,27 +674,198 @@ def main(**kwargs):
         logging.info('latest logs already analyzed, see {}'.format(report))
         return
 
-    compressed = log_file.extension == '.gz'
-    data = parse_log(file_path=log_file.path, pattern=ui_log_string_re, compressed=compressed)
+    analyze_log(log_file, kwargs, template, report, cache=get_state_cache(kwargs))
+
+    save_metrics(kwargs)
+    logging.info('done. report: {}'.format(report))
+    return report
+
+
+@catcher(logger=logging)
+def rollup(**kwargs):
+    work_dir = os.path.abspath(os.path.dirname(__file__))
+    metrics.reset()
+    days = kwargs['ROLLUP_DAYS']
+    config = dict(kwargs, QUANTILES=kwargs.get('QUANTILES', 'sketch'))
+
+    latest_file = find_latest(
+        catalog=kwargs.get('LOG_DIR', work_dir),
+        sample=ui_log_file_name_re,
+        date_format='%Y%m%d',
+        recursive=kwargs.get('LOG_DIR_RECURSIVE', False),
+        cache_file=kwargs.get('CATALOG_FILE')
+    )
 
-    with connect_to_db() as conn:
-        fill_table(conn=conn, data=data)
-        total_count = get_requests_count(conn)
-        total_time = get_total_time(conn)
-        errors_count = get_errors_count(conn)
+    if not latest_file:
+        logging.info('no files to process')
+        return
 
-        errors_perc = errors_count * 100.0 / total_count
-        threshold = kwargs.get('ERROR_THRESHOLD', 50)
-        assert errors_perc < threshold, 'could not parse more than {}% of logs'.format(threshold)
+    log_files = find_logs(
+        catalog=kwargs.get('LOG_DIR', work_dir),
+        sample=ui_log_file_name_re,
+        date_format='%Y%m%d',
+        since=latest_file.date - datetime.timedelta(days=days - 1),
+        until=latest_file.date,
+        recursive=kwargs.get('LOG_DIR_RECURSIVE', False),
+        cache_file=kwargs.get('CATALOG_FILE')
+    )
 
-        stat = get_requests_stats(conn=conn, limit=kwargs.get('REPORT_SIZE'))
-        aggr = aggr_requests_stat(stat=stat, total_time=total_time, total_count=total_count)
+    logging.info('analysing {} files from {:%Y.%m.%d} to {:%Y.%m.%d}'.format(
+        len(log_files), log_files[0].date, latest_file.date
+    ))
 
-    render_template(src=template, dst=report, data={'table_json': json.dumps(aggr)})
+    template = os.path.join(
+        kwargs.get('REPORT_DIR', os.path.join(work_dir, 'reports')),
+        'report.html'
+    )
+    report = os.path.join(
+        kwargs.get('REPORT_DIR', os.path.join(work_dir, 'reports')),
+        'report-{:%Y.%m.%d}-{}d.html'.format(latest_file.date, days)
+    )
+
+    assert os.path.exists(template), 'report template not found'
+
+    if os.path.exists(report):
+        logging.info('rollup already built, see {}'.format(report))
+        return
+
+    with aggregate_logs(log_files, config) as aggregator:
+        render_report(src=template, dst=report, rows=get_report_data(aggregator, config))
+
+    save_metrics(kwargs)
     logging.info('done. report: {}'.format(report))
     return report
 
 
+def render_windows(window, windows, template, report_dir, config, now):
+    reports = []
+
+    for minutes in windows:
+        with window.aggregate(minutes * 60, now) as aggregator:
+            if not aggregator.requests_count:
+                continue
+
+            try:
+                rows = get_report_data(aggregator, config)
+            except AssertionError as e:
+                logging.warning('last {} minutes skipped: {}'.format(minutes, e))
+                continue
+
+            report = os.path.join(report_dir, 'report-live-{}m.html'.format(minutes))
+            render_report(src=template, dst=report, rows=rows)
+            reports.append(report)
+
+    return reports
+
+
+@catcher(logger=logging)
+def follow(**kwargs):
+    work_dir = os.path.abspath(os.path.dirname(__file__))
+    report_dir = kwargs.get('REPORT_DIR', os.path.join(work_dir, 'reports'))
+    template = os.path.join(report_dir, 'report.html')
+    assert os.path.exists(template), 'report template not found'
+
+    path = kwargs.get('FOLLOW_LOG', os.path.join(kwargs.get('LOG_DIR', work_dir), 'nginx-access-ui.log'))
+    windows = sorted(kwargs.get('FOLLOW_WINDOWS', [5, 15, 60]))
+    interval = kwargs.get('FOLLOW_INTERVAL', 60)
+    pattern = get_pattern(kwargs)
+
+    assert kwargs.get('BACKEND', 'stream') == 'stream', 'follow mode is supported by stream backend only'
+    normalizer = create_normalizer(kwargs)
+    follower = LogFollower(path)
+    window = SlidingWindow(windows[-1] * 60, factory=lambda: create_aggregator(kwargs))
+    next_render = time.time() + interval
+
+    logging.info('following {}'.format(path))
+
+    try:
+        while True:
+            lines = follower.read()
+            now = time.time()
+
+            if lines:
+                window.update(normalize(parse_lines(lines, pattern), normalizer), now)
+
+            if now >= next_render:
+                for report in render_windows(window, windows, template, report_dir, kwargs, now):
+                    logging.info('report updated: {}'.format(report))
+                next_render = now + interval
+
+            if not lines:
+                time.sleep(kwargs.get('FOLLOW_POLL', 1))
+    finally:
+        follower.close()
+
+
+def write_status(status_file, status):
+    if not status_file:
+        return
+
+    with replace_file(status_file) as tf:
+        json.dump(status, tf, indent=2, sort_keys=True)
+
+
+def process_new_logs(watcher, status, config, template, report_dir, cache=None):
+    reports = []
+
+    for log_file in watcher.poll():
+        watcher.mark(log_file)
+
+        report = os.path.join(report_dir, 'report-{:%Y.%m.%d}.html'.format(log_file.date))
+        if os.path.exists(report):
+            logging.info('{} already analyzed, see {}'.format(log_file.path, report))
+            continue
+
+        logging.info('analysing file: {}'.format(log_file.path))
+        metrics.reset()
+        started = time.time()
+
+        try:
+            lines = analyze_log(log_file, config, template, report, cache=cache)
+        except Exception as e:
+            # a broken log must not stop the daemon, it is reported in the status and skipped
+            logging.exception(e)
+            status.failure(log_file.path, e, time.time())
+            continue
+
+        now = time.time()
+        status.success(log_file.path, lines, now - started, report, now)
+        save_metrics(config)
+        reports.append(report)
+        logging.info('done. report: {}'.format(report))
+
+    write_status(config.get('STATUS_FILE'), status.as_dict(watcher.backlog(), time.time()))
+    return reports
+
+
+@catcher(logger=logging)
+def daemon(**kwargs):
+    work_dir = os.path.abspath(os.path.dirname(__file__))
+
+    if kwargs.get('CACHE_DIR'):
+        kwargs = dict(kwargs, QUANTILES=kwargs.get('QUANTILES', 'sketch'))
+
+    log_dir = kwargs.get('LOG_DIR', work_dir)
+    report_dir = kwargs.get('REPORT_DIR', os.path.join(work_dir, 'reports'))
+    template = os.path.join(report_dir, 'report.html')
+    assert os.path.exists(template), 'report template not found'
+
+    interval = kwargs.get('DAEMON_INTERVAL', 60)
+    # everything that is built once per run by cron stays warm between logs
+    get_pattern(kwargs)
+    cache = get_state_cache(kwargs)
+    catalog = LogCatalog(log_dir, ui_log_file_name_re, '%Y%m%d', recursive=kwargs.get('LOG_DIR_RECURSIVE', False))
+    watcher = LogWatcher(catalog)
+    watcher.skip_history()
+    status = DaemonStatus(time.time())
+
+    logging.info('watching {}'.format(log_dir))
+
+    while True:
+        process_new_logs(watcher, status, kwargs, template, report_dir, cache=cache)
+        time.sleep(interval)
+
+
 class ParseConfigAction(argparse.Action):
     def __call__(self, arg_parser, namespace, value, option_string=None):
         if not (os.path.exists(value) and os.path.isfile(value)):
@@ -259,4 +897,11 @@ if __name__ == "__main__":
         stream=sys.stdout
     )
 
-    main(**args.config)
+    if args.config.get('DAEMON'):
+        daemon(**args.config)
+    elif args.config.get('FOLLOW'):
+        follow(**args.config)
+    elif args.config.get('ROLLUP_DAYS'):
+        rollup(**args.config)
+    else:
+        main(**args.config)
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+import re
+
+id_rules = (
+    (r'/[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}(?=/|$)', '/{uuid}'),
+    (r'/\d+(?=/|$)', '/{id}'),
+)
+
+
+class UrlNormalizer(object):
+    def __init__(self, strip_query=False, rules=(), max_urls=None, other='OTHER'):
+        self.strip_query = strip_query
+        self.rules = [(re.compile(pattern), replacement) for pattern, replacement in rules]
+        self.max_urls = max_urls
+        self.other = other
+        self.seen = set()
+
+    def rewrite(self, url):
+        if self.strip_query:
+            url = url.partition('?')[0]
+
+        for regexp, replacement in self.rules:
+            url = regexp.sub(replacement, url)
+
+        return url
+
+    def cap(self, url):
+        if self.max_urls and url is not None and url not in self.seen:
+            if len(self.seen) >= self.max_urls:
+                return self.other
+            self.seen.add(url)
+
+        return url
+
+    def normalize(self, url):
+        if url is None:
+            return url
+
+        return self.cap(self.rewrite(url))
+
+    def __call__(self, data):
+        normalize = self.normalize
+
+        for url, request_time in data:
+            yield normalize(url), request_time
+
+
+def track_urls(data, order):
+    seen = set()
+
+    for url, request_time in data:
+        if url not in seen:
+            seen.add(url)
+            order.append(url)
+        yield url, request_time
@@ -25,3 +25,143 @@ ui_log_string_re = re.compile(
 )
 
 ui_log_file_name_re = r'nginx-access-ui\.log-(?P<date>\d{8})(?P<extension>\.gz$|$)'
+
+request_time_re = re.compile(r'\d+\.\d+$')
+
+# request_time is carried as integer microseconds from parsing to the report
+time_scale = 1000000
+
+
+def parse_request_time(value):
+    # nginx writes milliseconds, that common case skips the generic split
+    if value[-4:-3] == '.':
+        return int(value[:-4] + value[-3:]) * 1000
+
+    whole, __, frac = value.partition('.')
+    return int(whole) * time_scale + int(frac[:6].ljust(6, '0'))
+
+
+class FastMatch(object):
+    __slots__ = ('url', 'request_time')
+
+    def __init__(self, url, request_time):
+        self.url = url
+        self.request_time = request_time
+
+    def group(self, name):
+        return getattr(self, name)
+
+
+class FastPattern(object):
+    # takes url from the first quoted field and request_time after the last space, falls back to the full regex
+    def __init__(self, fallback):
+        self.fallback = fallback
+
+    def match(self, string, pos=0, endpos=None):
+        endpos = len(string) if endpos is None else endpos
+
+        quote = string.find('"', pos, endpos)
+        method_end = string.find(' ', quote + 1, endpos)
+        url_end = string.find(' ', method_end + 1, endpos)
+        request_end = string.find('"', quote + 1, endpos)
+        last_space = string.rfind(' ', pos, endpos)
+
+        if 0 <= quote < method_end and method_end + 1 < url_end < request_end < last_space and \
+                string.find(' ', url_end + 1, request_end) < 0:
+            request_time = string[last_space + 1:endpos].rstrip()
+            if request_time_re.match(request_time):
+                return FastMatch(string[method_end + 1:url_end], request_time)
+
+        return self.fallback.match(string, pos, endpos)
+
+
+ui_log_string_fast = FastPattern(ui_log_string_re)
+
+
+# the layout the ui logs are actually written in: the real ip goes after a double space
+ui_log_format = '$remote_addr $remote_user  $http_x_real_ip [$time_local] "$request" ' \
+                '$status $body_bytes_sent "$http_referer" ' \
+                '"$http_user_agent" "$http_x_forwarded_for" "$http_X_REQUEST_ID" "$http_X_RB_USER" ' \
+                '$request_time'
+
+log_format_variable_re = re.compile(r'\$(?:\{(\w+)\}|(\w+))')
+
+# patterns for extracted variables, the rest are skipped up to the next delimiter
+log_format_params = {
+    'time_local': ui_re_params['time_local'],
+    'status': ui_re_params['status'],
+    'body_bytes_sent': ui_re_params['body_bytes_sent'],
+    'bytes_sent': r'\d+',
+    'request_length': r'\d+',
+    'request_time': r'\d+\.\d+',
+    'upstream_response_time': r'[\d.,: -]+',
+}
+
+# variables taken out of another one: source variable -> its space separated parts
+log_format_derived = {
+    'request': (('method', r'[A-Z]+'), ('url', r'\S+'), ('protocol', r'\S+')),
+}
+
+log_format_cache = {}
+
+
+def parse_log_format(log_format):
+    # nginx concatenates the quoted parts of log_format
+    if not isinstance(log_format, basestring):
+        log_format = ''.join(log_format)
+
+    tokens, pos = [], 0
+
+    for match in log_format_variable_re.finditer(log_format):
+        tokens.append(log_format[pos:match.start()])
+        tokens.append(match.group(1) or match.group(2))
+        pos = match.end()
+
+    tokens.append(log_format[pos:])
+    # literals and variable names alternate, starting and ending with a (possibly empty) literal
+    return tokens
+
+
+def variable_pattern(name, wanted, skip):
+    parts = log_format_derived.get(name, ())
+
+    if any(part in wanted for part, __ in parts):
+        pattern = ' '.join('(?P<{}>{})'.format(part, p) if part in wanted else p for part, p in parts)
+    else:
+        pattern = log_format_params.get(name, skip)
+
+    return '(?P<{}>{})'.format(name, pattern) if name in wanted else pattern
+
+
+def compile_log_format(log_format, variables=('url', 'request_time')):
+    key = (log_format if isinstance(log_format, basestring) else tuple(log_format), tuple(variables))
+    if key in log_format_cache:
+        return log_format_cache[key]
+
+    tokens = parse_log_format(log_format)
+    names, wanted, used = tokens[1::2], set(variables), set()
+
+    sources = dict((part, name) for name in names for part, __ in log_format_derived.get(name, ()))
+    for variable in variables:
+        assert variable in names or variable in sources, 'log format has no variable for {}'.format(variable)
+
+    parts = [re.escape(tokens[0])]
+
+    for i in xrange(1, len(tokens), 2):
+        name, literal = tokens[i], tokens[i + 1]
+        extracted = name in wanted or any(sources.get(variable) == name for variable in wanted)
+
+        if extracted and name not in used:
+            # a value can't contain its delimiter, so skipping is a single negated class without backtracking
+            skip = '[^{}]*'.format(re.escape(literal[0])) if literal else '.*?'
+            parts.append(variable_pattern(name, wanted, skip))
+            used.add(name)
+        elif literal:
+            parts.append('[^{}]*'.format(re.escape(literal[0])))
+        elif i + 2 < len(tokens):
+            parts.append('.*?')
+
+        parts.append(re.escape(literal))
+
+    compiled = log_format_cache[key] = re.compile(''.join(parts))
+    return compiled
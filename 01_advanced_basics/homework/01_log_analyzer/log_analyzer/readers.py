@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+import zlib
+import gzip
+import Queue
+import threading
+import subprocess
+from distutils.spawn import find_executable
+
+decompressors = (
+    ('pigz', '-dc'),
+    ('zcat', ),
+)
+
+
+def find_decompressor():
+    for command in decompressors:
+        executable = find_executable(command[0])
+        if executable:
+            return (executable, ) + command[1:]
+
+    return None
+
+
+def read_gzip_plain(file_path):
+    with gzip.open(file_path, 'rb') as lf:
+        for line in lf:
+            yield line
+
+
+def split_lines(blocks):
+    tail = ''
+
+    for data in blocks:
+        lines = (tail + data).split('\n')
+        tail = lines.pop()
+        for line in lines:
+            yield line
+
+    if tail:
+        yield tail
+
+
+def read_gzip_pipe(file_path, command=None, buffer_size=1 << 20):
+    command = command or find_decompressor()
+    assert command, 'no external gzip decompressor found'
+
+    process = subprocess.Popen(
+        list(command) + [file_path], stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=buffer_size
+    )
+
+    try:
+        for line in split_lines(iter(lambda: process.stdout.read(buffer_size), '')):
+            yield line
+
+        if process.wait():
+            raise IOError('{} failed: {}'.format(command[0], process.stderr.read().strip()))
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        process.stderr.close()
+
+
+def decompress_blocks(file_path, block_size):
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    with open(file_path, 'rb') as lf:
+        for raw in iter(lambda: lf.read(block_size), ''):
+            data = decompressor.decompress(raw)
+
+            while decompressor.unused_data:
+                # concatenated gzip members
+                raw = decompressor.unused_data
+                data += decompressor.flush()
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                data += decompressor.decompress(raw)
+
+            yield data
+
+    yield decompressor.flush()
+
+
+def read_gzip_threaded(file_path, block_size=1 << 20, queue_size=8):
+    blocks = Queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+
+    def produce():
+        try:
+            tail = ''
+
+            for data in decompress_blocks(file_path, block_size):
+                if stop.is_set():
+                    return
+                lines = (tail + data).split('\n')
+                tail = lines.pop()
+                blocks.put(lines)
+
+            blocks.put([tail] if tail else [])
+            blocks.put(None)
+        except Exception as e:
+            blocks.put(e)
+
+    producer = threading.Thread(target=produce, name='gzip-reader')
+    producer.daemon = True
+    producer.start()
+
+    try:
+        while True:
+            lines = blocks.get()
+            if lines is None:
+                break
+            if isinstance(lines, Exception):
+                raise lines
+            for line in lines:
+                yield line
+    finally:
+        stop.set()
+        while producer.is_alive():
+            try:
+                blocks.get(timeout=0.1)
+            except Queue.Empty:
+                pass
+
+
+def read_gzip(file_path, reader='auto'):
+    if reader == 'auto':
+        # zcat in a pipe loses to the in-process thread, only multithreaded pigz is worth spawning
+        reader = 'pipe' if find_executable('pigz') else 'thread'
+
+    if reader == 'pipe':
+        return read_gzip_pipe(file_path)
+    elif reader == 'thread':
+        return read_gzip_threaded(file_path)
+    elif reader == 'gzip':
+        return read_gzip_plain(file_path)
+
+    raise ValueError('unknown gzip reader: {}'.format(reader))
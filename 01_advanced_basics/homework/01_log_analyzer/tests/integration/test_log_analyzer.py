@@ -1,8 +1,18 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 import os
+import re
+import gzip
+import json
+import random
+import shutil
+import tempfile
 import unittest
 from log_analyzer import log_analyzer
+from log_analyzer import patterns
+from log_analyzer.decorators import metrics
+from log_analyzer.patterns import ui_log_string_re
+from log_analyzer.columnar import np
 
 
 class TestLogAnalyzer(unittest.TestCase):
@@ -33,5 +43,358 @@ class TestLogAnalyzer(unittest.TestCase):
         os.remove(self.report_file)
 
 
+class TestLogFormat(unittest.TestCase):
+    def setUp(self):
+        fixtures = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'fixtures')
+        self.temp_dir = tempfile.mkdtemp()
+
+        shutil.copy(os.path.join(fixtures, 'reports', 'report.html'), self.temp_dir)
+
+        with open(os.path.join(fixtures, 'reports', 'report-2017.07.01.html.expected'), 'rb') as ef:
+            self.expected = ef.read()
+
+        self.config = {
+            "REPORT_DIR": self.temp_dir,
+            "LOG_DIR": os.path.join(fixtures, 'log'),
+            "LOG_FORMAT": patterns.ui_log_format,
+            "ERROR_THRESHOLD": 99
+        }
+
+    def test_report_with_compiled_format(self):
+        with open(log_analyzer.main(**self.config), 'rb') as r:
+            self.assertMultiLineEqual(self.expected, r.read())
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+
+class TestStateCache(unittest.TestCase):
+    def setUp(self):
+        fixtures = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'fixtures')
+        self.temp_dir = tempfile.mkdtemp()
+        self.logs = os.path.join(self.temp_dir, 'log')
+        self.reports = os.path.join(self.temp_dir, 'reports')
+
+        shutil.copytree(os.path.join(fixtures, 'log'), self.logs)
+        os.mkdir(self.reports)
+        shutil.copy(os.path.join(fixtures, 'reports', 'report.html'), self.reports)
+
+        self.config = {
+            "REPORT_DIR": self.reports,
+            "LOG_DIR": self.logs,
+            "CACHE_DIR": os.path.join(self.temp_dir, 'cache'),
+            "ERROR_THRESHOLD": 99
+        }
+
+    def test_report_from_cached_state(self):
+        report_file = log_analyzer.main(**self.config)
+        with open(report_file, 'rb') as r:
+            expected = r.read()
+        os.remove(report_file)
+
+        log_file = os.path.join(self.logs, 'nginx-access-ui.log-20170701')
+        with open(log_file, 'rb') as lf:
+            content = lf.read()
+        stat = os.stat(log_file)
+
+        with open(log_file, 'wb') as lf:
+            lf.write(content.replace('/api/', '/xxx/'))
+        os.utime(log_file, (stat.st_atime, stat.st_mtime))
+
+        with open(log_analyzer.main(**self.config), 'rb') as r:
+            self.assertMultiLineEqual(expected, r.read())
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+
+class TestUrlNormalization(unittest.TestCase):
+    def setUp(self):
+        self.log_file = os.path.join(
+            os.path.abspath(os.path.dirname(__file__)), 'fixtures', 'log', 'nginx-access-ui.log-20170701'
+        )
+        self.config = {
+            'URL_NORMALIZATION': {'STRIP_QUERY': True, 'COLLAPSE_IDS': True, 'MAX_URLS': 20},
+            'WORKERS': 1
+        }
+
+    def test_distinct_urls_are_capped(self):
+        for workers in (1, 2):
+            config = dict(self.config, WORKERS=workers)
+
+            with log_analyzer.aggregate_log(self.log_file, config) as aggregator:
+                urls = aggregator.urls
+                self.assertLessEqual(len(urls), 20 * workers + 1)
+                self.assertIn('OTHER', urls)
+                self.assertIn('/api/v2/banner/{id}', urls)
+                self.assertEqual(1000, aggregator.requests_count)
+
+
+class TestErrorThreshold(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.log_file = os.path.join(self.temp_dir, 'nginx-access-ui.log-20170701')
+
+        with open(self.log_file, 'wb') as lf:
+            for i in xrange(20000):
+                lf.write('not a log line {}\n'.format(i))
+
+        self.config = {'ERROR_THRESHOLD': 50, 'ERROR_MIN_SAMPLE': 1000}
+
+    def test_abort_before_end_of_log(self):
+        metrics.reset()
+        self.assertRaises(AssertionError, log_analyzer.aggregate_log, self.log_file, self.config)
+        self.assertLess(metrics.stages['parse_log']['items'], 20000)
+
+    def test_abort_in_workers(self):
+        for compressed in (False, True):
+            if compressed:
+                with open(self.log_file, 'rb') as lf, gzip.open(self.log_file + '.gz', 'wb') as gf:
+                    shutil.copyfileobj(lf, gf)
+
+            config = dict(self.config, WORKERS=2, BATCH_SIZE=500)
+            self.assertRaises(AssertionError, log_analyzer.aggregate_log,
+                              self.log_file + ('.gz' if compressed else ''), config, compressed=compressed)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+
+class TestRollup(unittest.TestCase):
+    def setUp(self):
+        fixtures = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'fixtures')
+        self.log_file = os.path.join(fixtures, 'log', 'nginx-access-ui.log-20170701')
+        self.temp_dir = tempfile.mkdtemp()
+        self.logs = os.path.join(self.temp_dir, 'log')
+        self.reports = os.path.join(self.temp_dir, 'reports')
+
+        os.mkdir(self.logs)
+        os.mkdir(self.reports)
+        shutil.copy(os.path.join(fixtures, 'reports', 'report.html'), self.reports)
+
+        for date in ('20170601', '20170630', '20170701'):
+            shutil.copy(self.log_file, os.path.join(self.logs, 'nginx-access-ui.log-{}'.format(date)))
+
+        with open(self.log_file, 'rb') as lf, \
+                gzip.open(os.path.join(self.logs, 'nginx-access-ui.log-20170629.gz'), 'wb') as gf:
+            shutil.copyfileobj(lf, gf)
+
+        self.config = {
+            "REPORT_DIR": self.reports,
+            "LOG_DIR": self.logs,
+            "ERROR_THRESHOLD": 99,
+            "ROLLUP_DAYS": 7
+        }
+
+    def read_report(self, report_file):
+        with open(report_file, 'rb') as r:
+            return json.loads(re.search(r'var table = (.*);', r.read()).group(1))
+
+    def daily(self):
+        data = log_analyzer.parse_log(self.log_file, ui_log_string_re)
+
+        with log_analyzer.create_aggregator({}) as aggregator:
+            aggregator.update(data)
+            return dict((url, stat.count) for url, stat in aggregator.urls.iteritems())
+
+    def test_rollup_merges_days_in_range(self):
+        for workers in (1, 3):
+            report_file = log_analyzer.rollup(WORKERS=workers, **self.config)
+            self.assertEqual(os.path.join(self.reports, 'report-2017.07.01-7d.html'), report_file)
+
+            rows = self.read_report(report_file)
+            self.assertEqual(dict((url, count * 3) for url, count in self.daily().iteritems()),
+                             dict((row['url'], row['count']) for row in rows))
+            self.assertTrue(all('time_p99' in row for row in rows))
+
+            os.remove(report_file)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+
+class TestDaemon(unittest.TestCase):
+    def setUp(self):
+        fixtures = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'fixtures')
+        self.log_file = os.path.join(fixtures, 'log', 'nginx-access-ui.log-20170701')
+        self.temp_dir = tempfile.mkdtemp()
+        self.logs = os.path.join(self.temp_dir, 'log')
+        self.reports = os.path.join(self.temp_dir, 'reports')
+
+        os.mkdir(self.logs)
+        os.mkdir(self.reports)
+        shutil.copy(os.path.join(fixtures, 'reports', 'report.html'), self.reports)
+
+        for date in ('20170630', '20170701'):
+            shutil.copy(self.log_file, os.path.join(self.logs, 'nginx-access-ui.log-{}'.format(date)))
+
+        self.config = {
+            "REPORT_DIR": self.reports,
+            "LOG_DIR": self.logs,
+            "STATUS_FILE": os.path.join(self.temp_dir, 'status.json'),
+            "ERROR_THRESHOLD": 99
+        }
+        self.watcher = log_analyzer.LogWatcher(
+            log_analyzer.LogCatalog(self.logs, patterns.ui_log_file_name_re, '%Y%m%d')
+        )
+        self.status = log_analyzer.DaemonStatus(0)
+
+    def process(self):
+        template = os.path.join(self.reports, 'report.html')
+        return log_analyzer.process_new_logs(self.watcher, self.status, self.config, template, self.reports)
+
+    def read_status(self):
+        with open(self.config['STATUS_FILE']) as sf:
+            return json.load(sf)
+
+    def test_process_new_logs(self):
+        self.watcher.skip_history()
+        self.assertEqual([os.path.join(self.reports, 'report-2017.07.01.html')], self.process())
+
+        with open(self.log_file, 'rb') as lf, \
+                open(os.path.join(self.logs, 'nginx-access-ui.log-20170702'), 'wb') as nf:
+            nf.write(lf.read() + 'broken line\n' * 1000)
+
+        self.assertEqual([], self.process())
+        self.assertEqual(1, self.read_status()['backlog_files'])
+
+        self.config['ERROR_THRESHOLD'] = 10
+        self.assertEqual([], self.process())
+
+        status = self.read_status()
+        self.assertEqual(0, status['backlog_files'])
+        self.assertEqual(1, status['processed_files'])
+        self.assertEqual(1000, status['lines'])
+        self.assertEqual(1, status['failed_files'])
+        self.assertFalse(os.path.exists(os.path.join(self.reports, 'report-2017.06.30.html')))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        fixtures = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'fixtures')
+        self.temp_dir = tempfile.mkdtemp()
+        self.reports = os.path.join(self.temp_dir, 'reports')
+
+        os.mkdir(self.reports)
+        shutil.copy(os.path.join(fixtures, 'reports', 'report.html'), self.reports)
+
+        self.config = {
+            "REPORT_DIR": self.reports,
+            "LOG_DIR": os.path.join(fixtures, 'log'),
+            "BACKEND": "sqlite",
+            "METRICS_FILE": os.path.join(self.temp_dir, 'metrics.json'),
+            "ERROR_THRESHOLD": 99
+        }
+
+    def test_metrics_file(self):
+        log_analyzer.main(**self.config)
+
+        with open(self.config['METRICS_FILE']) as mf:
+            metrics = json.load(mf)
+
+        stages = metrics['stages']
+        self.assertItemsEqual(
+            ['find_latest', 'parse_log', 'fill_table', 'aggregate_log', 'get_requests_stats', 'render_report'],
+            stages.keys()
+        )
+        self.assertEqual(stages['parse_log']['items'], 1000)
+        self.assertLessEqual(stages['fill_table']['own'], stages['fill_table']['duration'])
+        self.assertGreater(metrics['peak_rss_mb'], 0)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+
+class TestBackends(unittest.TestCase):
+    def setUp(self):
+        self.log_file = os.path.join(
+            os.path.abspath(os.path.dirname(__file__)), 'fixtures', 'log', 'nginx-access-ui.log-20170701'
+        )
+
+    def aggregate(self, **config):
+        data = log_analyzer.parse_log(self.log_file, ui_log_string_re)
+        percentiles = log_analyzer.get_percentiles(config)
+
+        with log_analyzer.create_aggregator(config) as aggregator:
+            aggregator.update(data)
+            stat = aggregator.stats(limit=1000, percentiles=percentiles)
+            aggr = log_analyzer.aggr_requests_stat(stat, aggregator.total_time, aggregator.requests_count, percentiles)
+
+        return sorted(aggr, key=lambda row: (-row['time_sum'], row['url']))
+
+    def test_stream_backend_matches_sqlite(self):
+        self.assertEqual(self.aggregate(BACKEND='sqlite'), self.aggregate(BACKEND='stream'))
+
+    @unittest.skipUnless(np, 'numpy is not installed')
+    def test_numpy_backend_matches_sqlite(self):
+        self.assertEqual(
+            self.aggregate(BACKEND='sqlite', PERCENTILES=[95]),
+            self.aggregate(BACKEND='numpy', PERCENTILES=[95])
+        )
+
+    def test_sketch_quantiles_match_exact(self):
+        self.assertEqual(
+            self.aggregate(BACKEND='sqlite', PERCENTILES=[50, 95, 99]),
+            self.aggregate(BACKEND='stream', QUANTILES='sketch')
+        )
+
+
+class TestParallel(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.log_file = os.path.join(
+            os.path.abspath(os.path.dirname(__file__)), 'fixtures', 'log', 'nginx-access-ui.log-20170701'
+        )
+        self.gzip_file = os.path.join(self.temp_dir, 'nginx-access-ui.log-20170701.gz')
+
+        with open(self.log_file, 'rb') as lf, gzip.open(self.gzip_file, 'wb') as gf:
+            shutil.copyfileobj(lf, gf)
+
+    def aggregate(self, file_path, compressed, **config):
+        with log_analyzer.create_aggregator(config) as aggregator:
+            if config.get('WORKERS', 1) > 1:
+                log_analyzer.aggregate_parallel(aggregator, file_path, ui_log_string_re, config, compressed)
+            else:
+                aggregator.update(log_analyzer.parse_log(file_path, ui_log_string_re, compressed))
+
+            stat = aggregator.stats(limit=1000)
+            return log_analyzer.aggr_requests_stat(stat, aggregator.total_time, aggregator.requests_count)
+
+    def test_parallel_plain_matches_serial(self):
+        self.assertEqual(self.aggregate(self.log_file, False), self.aggregate(self.log_file, False, WORKERS=4))
+
+    def test_parallel_url_cap_matches_serial(self):
+        line = '1.196.116.32 -  - [29/Jun/2017:03:50:22 +0300] "GET /api/v2/banner/{} HTTP/1.1" 200 927 ' \
+               '"-" "Slotovod" "-" "1498697422-2190034393-4708-9752759" "-" {:.3f}\n'
+        rnd = random.Random(3)
+        lines = [line.format(rnd.randint(0, 5000), rnd.random()) for __ in xrange(20000)]
+
+        plain_file = os.path.join(self.temp_dir, 'nginx-access-ui.log-20170702')
+        gzip_file = plain_file + '.gz'
+        with open(plain_file, 'wb') as lf, gzip.open(gzip_file, 'wb') as gf:
+            lf.writelines(lines)
+            gf.writelines(lines)
+
+        config = {'URL_NORMALIZATION': {'MAX_URLS': 20}, 'BATCH_SIZE': 1000}
+
+        for file_path, compressed in ((plain_file, False), (gzip_file, True)):
+            with log_analyzer.aggregate_log(file_path, config, compressed) as serial, \
+                    log_analyzer.aggregate_log(file_path, dict(config, WORKERS=2), compressed) as parallel:
+                self.assertEqual(21, len(parallel.urls))
+                self.assertEqual(list(serial.stats()), list(parallel.stats()))
+
+    def test_parallel_gzip_matches_serial(self):
+        self.assertEqual(
+            self.aggregate(self.gzip_file, True),
+            self.aggregate(self.gzip_file, True, WORKERS=3, BATCH_SIZE=128)
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+
 if __name__ == "__main__":
     unittest.main()
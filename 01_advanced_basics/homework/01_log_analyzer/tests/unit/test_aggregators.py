@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import unittest
+from log_analyzer import aggregators
+
+
+class TestMedian(unittest.TestCase):
+    def test_median_if_odd_row(self):
+        self.assertEqual(4.9, aggregators.median([t / 10.0 for t in xrange(98, -1, -1)]))
+
+    def test_median_if_even_row(self):
+        self.assertEqual(4.95, aggregators.median([t / 10.0 for t in xrange(99, -1, -1)]))
+
+
+class TestStreamAggregator(unittest.TestCase):
+    def setUp(self):
+        # request times are integer microseconds
+        self.d0 = [('/api/v2/banner/16852666', t * 200000) for t in xrange(0, 100, 1)]
+        self.d1 = [('/api/v2/banner/16852667', t * 100000) for t in xrange(0, 100, 1)]
+        self.d2 = [('/api/v2/banner/16852668', t * 50000) for t in xrange(0, 100, 1)]
+        self.errors = [(None, 0)] * 10
+
+        self.expected = [
+            ('/api/v2/banner/16852666', 100, 990000000, 9900000.0, 19800000, 9900000.0),
+            ('/api/v2/banner/16852667', 100, 495000000, 4950000.0, 9900000, 4950000.0),
+            ('/api/v2/banner/16852668', 100, 247500000, 2475000.0, 4950000, 2475000.0),
+            (None, 10, 0, 0.0, 0, 0),
+        ]
+
+    def test_counters(self):
+        aggregator = aggregators.StreamAggregator().update(self.d0 + self.errors + self.d1 + self.d2)
+        self.assertEqual(310, aggregator.requests_count)
+        self.assertEqual(10, aggregator.errors_count)
+        self.assertEqual(990000000 + 495000000 + 247500000, aggregator.total_time)
+
+    def test_stats_if_no_limit(self):
+        aggregator = aggregators.StreamAggregator().update(self.d2 + self.errors + self.d1 + self.d0)
+        self.assertEqual(self.expected, list(aggregator.stats(limit=None)))
+
+    def test_stats_if_limit(self):
+        aggregator = aggregators.StreamAggregator().update(self.d2 + self.errors + self.d1 + self.d0)
+        self.assertEqual(self.expected[:2], list(aggregator.stats(limit=2)))
+
+    def test_merge(self):
+        left = aggregators.StreamAggregator().update(self.d0[:50] + self.d1 + self.errors)
+        right = aggregators.StreamAggregator().update(self.d0[50:] + self.d2)
+        self.assertEqual(self.expected, list(left.merge(right).stats(limit=None)))
+
+    def test_rename(self):
+        aggregator = aggregators.StreamAggregator().update(self.d0 + self.d1 + self.d2 + self.errors)
+        aggregator.rename({'/api/v2/banner/16852667': 'OTHER', '/api/v2/banner/16852668': 'OTHER'})
+
+        self.assertEqual(
+            [self.expected[0], ('OTHER', 200, 742500000, 3712500.0, 9900000, 3300000.0), self.expected[3]],
+            list(aggregator.stats(limit=None))
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import unittest
+import tempfile
+from log_analyzer import cache
+from log_analyzer import aggregators
+
+
+class TestStateCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.temp_dir, 'cache')
+        self.log_file = os.path.join(self.temp_dir, 'log')
+
+        with open(self.log_file, 'wb') as lf:
+            lf.write('/api/v2/banner/25019354 0.390\n')
+
+        self.state = aggregators.StreamAggregator(sketch_size=200).update(
+            [('/api/v2/banner/25019354', 390000), ('/api/v2/banner/16852664', 199000), (None, 0)]
+        )
+
+    def test_load_if_missing(self):
+        self.assertIsNone(cache.StateCache(self.cache_dir).load(self.log_file))
+
+    def test_save_and_load(self):
+        cache.StateCache(self.cache_dir).save(self.log_file, self.state)
+        state = cache.StateCache(self.cache_dir).load(self.log_file)
+        self.assertEqual(list(self.state.stats(percentiles=(95, ))), list(state.stats(percentiles=(95, ))))
+        self.assertEqual(self.state.errors_count, state.errors_count)
+
+    def test_load_if_log_changed(self):
+        cache.StateCache(self.cache_dir).save(self.log_file, self.state)
+
+        with open(self.log_file, 'ab') as lf:
+            lf.write('/api/v2/banner/16852664 0.199\n')
+
+        self.assertIsNone(cache.StateCache(self.cache_dir).load(self.log_file))
+
+    def test_load_if_other_variant(self):
+        cache.StateCache(self.cache_dir, variant='exact').save(self.log_file, self.state)
+        self.assertIsNone(cache.StateCache(self.cache_dir, variant='sketch:200').load(self.log_file))
+
+    def test_load_if_broken(self):
+        state_cache = cache.StateCache(self.cache_dir)
+        state_cache.save(self.log_file, self.state)
+
+        with open(state_cache.path(self.log_file), 'wb') as cf:
+            cf.write('garbage')
+
+        self.assertIsNone(state_cache.load(self.log_file))
+
+    def test_load_if_unpickling_fails(self):
+        state_cache = cache.StateCache(self.cache_dir)
+        state_cache.save(self.log_file, self.state)
+
+        # a missing class and a missing module
+        for data in ('clog_analyzer.aggregators\nMissing\n.', 'cmissing_module\nState\n.'):
+            with open(state_cache.path(self.log_file), 'wb') as cf:
+                cf.write(data)
+
+            self.assertIsNone(state_cache.load(self.log_file))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import time
+import shutil
+import datetime
+import tempfile
+import unittest
+from log_analyzer import catalog
+
+
+def touch(path, mtime=None):
+    with open(path, 'a'):
+        os.utime(path, (mtime, mtime) if mtime else None)
+
+
+class TestLogCatalog(unittest.TestCase):
+    def setUp(self):
+        self.sample = r'log-(?P<date>\d{8})(?P<extension>\.gz|$)'
+        self.temp_dir = tempfile.mkdtemp()
+        self.nested = os.path.join(self.temp_dir, '2017')
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache_file = os.path.join(self.cache_dir, 'catalog')
+
+        os.mkdir(self.nested)
+        for log in ('log-20180101.gz', 'log-20180201', 'log-2018.txt', 'other-20180301'):
+            touch(os.path.join(self.temp_dir, log))
+        touch(os.path.join(self.nested, 'log-20170101'))
+
+        self.age(self.temp_dir)
+        self.age(self.nested)
+
+    @staticmethod
+    def age(directory):
+        # make directory changes look settled
+        mtime = time.time() - 60
+        os.utime(directory, (mtime, mtime))
+
+    def create(self, recursive=False):
+        return catalog.LogCatalog(self.temp_dir, self.sample, '%Y%m%d', recursive=recursive)
+
+    def names(self, logs):
+        return [os.path.relpath(entry.path, self.temp_dir) for entry in logs.files()]
+
+    def test_non_recursive(self):
+        logs = self.create().refresh()
+        self.assertEqual(['log-20180101.gz', 'log-20180201'], self.names(logs))
+
+        entry = logs.files()[0]
+        self.assertEqual('.gz', entry.extension)
+        self.assertEqual(datetime.datetime(2018, 1, 1), entry.date)
+        self.assertEqual(0, entry.size)
+
+    def test_recursive(self):
+        logs = self.create(recursive=True).refresh()
+        self.assertEqual([os.path.join('2017', 'log-20170101'), 'log-20180101.gz', 'log-20180201'], self.names(logs))
+
+    def test_unchanged_directory_is_not_rescanned(self):
+        logs = self.create().refresh()
+        logs.scan = lambda directory, known: self.fail('{} rescanned'.format(directory))
+        logs.refresh()
+
+    def test_changed_directory_is_rescanned(self):
+        logs = self.create().refresh()
+        touch(os.path.join(self.temp_dir, 'log-20180301'))
+        self.age(self.temp_dir)
+
+        self.assertEqual(['log-20180101.gz', 'log-20180201', 'log-20180301'], self.names(logs.refresh()))
+
+    def test_recently_changed_directory_is_rescanned(self):
+        touch(os.path.join(self.temp_dir, 'log-20180301'))
+        logs = self.create().refresh()
+
+        scanned = []
+        scan = logs.scan
+        logs.scan = lambda directory, known: scanned.append(directory) or scan(directory, known)
+        logs.refresh()
+        self.assertEqual([self.temp_dir], scanned)
+
+    def test_save_and_load(self):
+        self.create().refresh().save(self.cache_file)
+
+        logs = self.create().load(self.cache_file)
+        logs.scan = lambda directory, known: self.fail('{} rescanned'.format(directory))
+        self.assertEqual(['log-20180101.gz', 'log-20180201'], self.names(logs.refresh()))
+
+    def test_load_for_other_settings(self):
+        self.create().refresh().save(self.cache_file)
+        self.assertEqual({}, self.create(recursive=True).load(self.cache_file).dirs)
+
+    def test_missing_directory(self):
+        shutil.rmtree(self.temp_dir)
+        self.assertEqual([], self.create().refresh().files())
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+        shutil.rmtree(self.cache_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import random
+import unittest
+from log_analyzer import columnar
+from log_analyzer import aggregators
+
+
+@unittest.skipUnless(columnar.np, 'numpy is not installed')
+class TestColumnarAggregator(unittest.TestCase):
+    def setUp(self):
+        rnd = random.Random(7)
+        self.data = [
+            (None if rnd.random() < 0.05 else '/api/v2/banner/{}'.format(rnd.randint(0, 300)),
+             int(rnd.expovariate(4.0) * 1000) * 1000)
+            for __ in xrange(20000)
+        ]
+
+    def test_matches_stream_aggregator(self):
+        stream = aggregators.StreamAggregator().update(self.data)
+        numpy = columnar.ColumnarAggregator().update(self.data)
+
+        self.assertEqual(stream.requests_count, numpy.requests_count)
+        self.assertEqual(stream.errors_count, numpy.errors_count)
+        self.assertEqual(stream.total_time, numpy.total_time)
+
+        for limit in (None, 10):
+            self.assertEqual(
+                list(stream.stats(limit=limit, percentiles=(95, 99))),
+                list(numpy.stats(limit=limit, percentiles=(95, 99)))
+            )
+
+    def test_merge(self):
+        merged = columnar.ColumnarAggregator().update(self.data[:5000])
+        merged.merge(columnar.ColumnarAggregator().update(self.data[5000:]))
+        single = columnar.ColumnarAggregator().update(self.data)
+        self.assertEqual(list(single.stats(limit=50)), list(merged.stats(limit=50)))
+
+    def test_rename(self):
+        mapping = dict(('/api/v2/banner/{}'.format(i), 'OTHER') for i in xrange(100, 301))
+        stream = aggregators.StreamAggregator().update(self.data).rename(mapping)
+        numpy = columnar.ColumnarAggregator().update(self.data).rename(mapping)
+        self.assertEqual(list(stream.stats(percentiles=(95, ))), list(numpy.stats(percentiles=(95, ))))
+
+    def test_empty(self):
+        numpy = columnar.ColumnarAggregator()
+        self.assertEqual(0, numpy.requests_count)
+        self.assertEqual(0, numpy.errors_count)
+        self.assertEqual([], list(numpy.stats(limit=10)))
+
+
+if __name__ == "__main__":
+    unittest.main()
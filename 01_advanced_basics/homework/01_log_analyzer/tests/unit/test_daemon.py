@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+from log_analyzer import catalog
+from log_analyzer import daemon
+
+
+class TestLogWatcher(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        for name in ('log-20180101', 'log-20180102'):
+            self.write(name, 'line\n')
+
+        self.watcher = daemon.LogWatcher(
+            catalog.LogCatalog(self.temp_dir, r'log-(?P<date>\d{8})(?P<extension>\.gz|$)', '%Y%m%d')
+        )
+
+    def write(self, name, content):
+        with open(os.path.join(self.temp_dir, name), 'ab') as lf:
+            lf.write(content)
+
+    def names(self, entries):
+        return [os.path.basename(entry.path) for entry in entries]
+
+    def test_skip_history(self):
+        self.watcher.skip_history()
+        self.assertEqual(['log-20180102'], self.names(self.watcher.poll()))
+
+    def test_new_file_waits_until_it_settles(self):
+        self.watcher.skip_history()
+        self.watcher.mark(self.watcher.poll()[0])
+
+        self.write('log-20180103', 'line\n')
+        self.assertEqual([], self.watcher.poll())
+        self.write('log-20180103', 'line\n')
+        self.assertEqual([], self.watcher.poll())
+        self.assertEqual(['log-20180103'], self.names(self.watcher.poll()))
+
+    def test_backlog(self):
+        self.watcher.skip_history()
+        self.write('log-20180103', 'line\n')
+        self.watcher.poll()
+
+        self.assertEqual([os.path.join(self.temp_dir, 'log-20180102'), os.path.join(self.temp_dir, 'log-20180103')],
+                         [path for path, __ in self.watcher.backlog()])
+        self.assertEqual(5, self.watcher.backlog()[1][1][0])
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+
+class TestDaemonStatus(unittest.TestCase):
+    def test_throughput(self):
+        status = daemon.DaemonStatus(started=100.0)
+        status.success('log-1', 1000, 2.0, 'report-1', now=110.0)
+        status.success('log-2', 3000, 2.0, 'report-2', now=120.0)
+        status.failure('log-3', AssertionError('broken'), now=130.0)
+
+        data = status.as_dict([('log-4', (10, 0.0)), ('log-5', (20, 0.0))], now=140.0)
+        self.assertEqual(2, data['processed_files'])
+        self.assertEqual(1, data['failed_files'])
+        self.assertEqual(1000, data['lines_per_sec'])
+        self.assertEqual(1500, data['last']['lines_per_sec'])
+        self.assertEqual('broken', data['last_error']['error'])
+        self.assertEqual(40.0, data['uptime'])
+        self.assertEqual(2, data['backlog_files'])
+        self.assertEqual(30, data['backlog_bytes'])
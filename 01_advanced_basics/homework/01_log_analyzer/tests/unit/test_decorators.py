@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import time
+import logging
+import unittest
+from log_analyzer import decorators
+
+
+class TestTimed(unittest.TestCase):
+    def setUp(self):
+        self.registry = decorators.Metrics()
+        self.timed = lambda: decorators.timed(logger=logging, registry=self.registry, chunk_size=2)
+
+    def test_function(self):
+        @self.timed()
+        def work(value):
+            time.sleep(0.01)
+            return value
+
+        self.assertEqual(work(1), 1)
+        self.assertEqual(work(2), 2)
+
+        metric = self.registry.stages['work']
+        self.assertEqual(metric['calls'], 2)
+        self.assertIsNone(metric['items'])
+        self.assertGreaterEqual(metric['duration'], 0.02)
+        self.assertGreater(metric['peak_rss_mb'], 0)
+
+    def test_generator_counts_items_and_own_time(self):
+        @self.timed()
+        def produce(count):
+            for i in xrange(count):
+                yield i
+
+        for __ in produce(5):
+            time.sleep(0.01)
+
+        metric = self.registry.stages['produce']
+        self.assertEqual(metric['items'], 5)
+        self.assertLess(metric['duration'], 0.01)
+
+    def test_nested_time_is_excluded(self):
+        @self.timed()
+        def produce(count):
+            for i in xrange(count):
+                time.sleep(0.01)
+                yield i
+
+        @self.timed()
+        def consume(data):
+            return sum(data)
+
+        self.assertEqual(consume(produce(3)), 3)
+
+        consume, produce = self.registry.stages['consume'], self.registry.stages['produce']
+        self.assertGreaterEqual(consume['duration'], 0.03)
+        self.assertLess(consume['own'], 0.01)
+        self.assertAlmostEqual(produce['own'], produce['duration'])
+
+    def test_exception_is_recorded(self):
+        @self.timed()
+        def fail():
+            raise ValueError
+
+        self.assertRaises(ValueError, fail)
+        self.assertEqual(self.registry.stages['fail']['calls'], 1)
+        self.assertEqual(self.registry.stack, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import unittest
+from log_analyzer import errors
+
+
+class TestWilsonInterval(unittest.TestCase):
+    def test_interval(self):
+        low, high = errors.wilson_interval(50, 100, 1.96)
+        self.assertAlmostEqual(0.4038, low, places=4)
+        self.assertAlmostEqual(0.5962, high, places=4)
+
+    def test_bounds(self):
+        self.assertAlmostEqual(0.0, errors.wilson_interval(0, 100, 1.96)[0])
+        self.assertAlmostEqual(1.0, errors.wilson_interval(100, 100, 1.96)[1])
+        self.assertEqual((0.0, 1.0), errors.wilson_interval(0, 0, 1.96))
+
+
+class TestErrorRateGuard(unittest.TestCase):
+    def test_exceeded(self):
+        guard = errors.ErrorRateGuard(50, min_sample=100)
+        self.assertFalse(guard.exceeded(99, 99))
+        self.assertTrue(guard.exceeded(90, 100))
+        self.assertFalse(guard.exceeded(55, 100))
+
+    def test_abort_after_min_sample(self):
+        guard = errors.ErrorRateGuard(50, min_sample=100, check_every=10)
+        data = guard((None, 0) for __ in xrange(1000))
+
+        consumed = []
+        with self.assertRaises(AssertionError):
+            for item in data:
+                consumed.append(item)
+        self.assertEqual(99, len(consumed))
+
+    def test_pass_through(self):
+        guard = errors.ErrorRateGuard(50, min_sample=10, check_every=10)
+        data = [('/a', 1), (None, 0)] * 50
+        self.assertEqual(data, list(guard(data)))
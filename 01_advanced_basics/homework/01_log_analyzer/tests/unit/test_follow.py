@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import unittest
+import tempfile
+from log_analyzer import follow
+from log_analyzer import aggregators
+
+
+class TestLogFollower(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'nginx-access-ui.log')
+
+        with open(self.path, 'wb') as lf:
+            lf.write('/old 0.100\n')
+
+        self.follower = follow.LogFollower(self.path)
+
+    def append(self, data, path=None):
+        with open(path or self.path, 'ab') as lf:
+            lf.write(data)
+
+    def test_read_from_end(self):
+        self.assertEqual([], self.follower.read())
+        self.append('/a 0.100\n/b 0.2')
+        self.assertEqual(['/a 0.100'], self.follower.read())
+        self.append('00\n')
+        self.assertEqual(['/b 0.200'], self.follower.read())
+
+    def test_read_if_log_missing(self):
+        os.remove(self.path)
+        self.assertEqual([], self.follower.read())
+        self.append('/a 0.100\n')
+        self.assertEqual(['/a 0.100'], self.follower.read())
+        self.append('/b 0.200\n')
+        self.assertEqual(['/b 0.200'], self.follower.read())
+
+    def test_read_if_rotated(self):
+        self.follower.read()
+        self.append('/a 0.100\n/b 0.200')
+        os.rename(self.path, self.path + '-20170701')
+        self.append('/c 0.300\n')
+
+        self.assertEqual(['/a 0.100', '/b 0.200'], self.follower.read())
+        self.assertEqual(['/c 0.300'], self.follower.read())
+
+    def test_read_if_truncated(self):
+        self.follower.read()
+        open(self.path, 'wb').close()
+        self.append('/a 0.100\n')
+        self.assertEqual(['/a 0.100'], self.follower.read())
+
+        self.append('/partial-old')
+        self.assertEqual([], self.follower.read())
+        open(self.path, 'wb').close()
+        self.append('/c 0.3\n/d 0.4\n')
+        self.assertEqual(['/c 0.3', '/d 0.4'], self.follower.read())
+
+    def tearDown(self):
+        self.follower.close()
+        shutil.rmtree(self.temp_dir)
+
+
+class TestSlidingWindow(unittest.TestCase):
+    def setUp(self):
+        self.window = follow.SlidingWindow(15 * 60, factory=aggregators.StreamAggregator)
+
+    def test_aggregate_windows(self):
+        for minute in xrange(0, 30, 1):
+            self.window.update([('/api/{}'.format(minute), minute * 1000)], now=minute * 60 + 30)
+
+        now = 29 * 60 + 40
+        self.assertEqual(5, self.window.aggregate(5 * 60, now).requests_count)
+        self.assertEqual(15, self.window.aggregate(15 * 60, now).requests_count)
+        self.assertEqual(15, len(self.window.buckets))
+        self.assertEqual('/api/29', next(self.window.aggregate(5 * 60, now).stats(limit=1))[0])
+
+    def test_aggregate_does_not_change_buckets(self):
+        self.window.update([('/api/1', 100000)], now=10)
+        self.window.aggregate(60, now=20).update([('/api/1', 200000)])
+        self.assertEqual(1, self.window.aggregate(60, now=20).requests_count)
+
+
+if __name__ == "__main__":
+    unittest.main()
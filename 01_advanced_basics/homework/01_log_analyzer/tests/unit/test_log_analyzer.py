@@ -10,6 +10,8 @@ import tempfile
 import datetime
 import json
 from log_analyzer import log_analyzer
+from log_analyzer import aggregators
+from log_analyzer import follow
 
 
 def touch(path):
@@ -67,6 +69,19 @@ class TestFindLatestLogFile(unittest.TestCase):
         self.assertEqual(self.latest_ext, latest.extension, args)
         self.assertEqual(self.latest_date, latest.date, args)
 
+    def test_find_logs_in_range(self):
+        args = (self.temp_dir, self.sample, self.date_format)
+        logs = log_analyzer.find_logs(*args, since=datetime.datetime(2018, 1, 1), until=datetime.datetime(2018, 3, 1))
+        self.assertEqual(
+            [os.path.join(self.temp_dir, log) for log in ('log-20180201.gz', 'log-20180301')],
+            [log.path for log in logs]
+        )
+
+    def test_find_all_logs(self):
+        logs = log_analyzer.find_logs(self.temp_dir, self.sample, self.date_format)
+        self.assertEqual(5, len(logs))
+        self.assertEqual(self.latest_date, logs[-1].date)
+
     def tearDown(self):
         shutil.rmtree(self.temp_dir)
 
@@ -75,25 +90,43 @@ class TestParseLogFile(unittest.TestCase):
     def setUp(self):
         self.sample = r'(?P<url>\S+) (?P<request_time>\d+\.\d+)'
         self.temp_dir = tempfile.mkdtemp()
-        self.data = (
+        self.lines = (
             ('/api/v2/banner/25019354', '0.390'),
             ('/api/1/photogenic_banners/list/?server_name=WIN7RB4', '0.133'),
             ('/api/v2/banner/16852664', '0.199'),
             ('/api/v2/slot/4705/groups', '0.704')
         )
+        # request_time is parsed into integer microseconds
+        self.data = (
+            ('/api/v2/banner/25019354', 390000),
+            ('/api/1/photogenic_banners/list/?server_name=WIN7RB4', 133000),
+            ('/api/v2/banner/16852664', 199000),
+            ('/api/v2/slot/4705/groups', 704000)
+        )
 
         self.plain_temp_file = os.path.join(self.temp_dir, 'log')
         with open(self.plain_temp_file, 'w') as tf:
-            tf.writelines([' '.join(words) for words in self.data])
+            tf.writelines([' '.join(words) for words in self.lines])
 
         self.gzip_temp_file = os.path.join(self.temp_dir, 'log.gz')
         with gzip.open(self.gzip_temp_file, 'w') as tf:
-            tf.writelines([' '.join(words) for words in self.data])
+            tf.writelines([' '.join(words) for words in self.lines])
 
     def test_parse_if_log_plain(self):
         for parsed in log_analyzer.parse_log(self.plain_temp_file, re.compile(self.sample), compressed=False):
             self.assertTrue(parsed in self.data, (self.sample, self.data))
 
+    def test_parse_if_log_mapped(self):
+        with open(self.plain_temp_file, 'w') as tf:
+            tf.writelines(['{} {}\n'.format(*words) for words in self.lines] + ['garbage\n', '\n', '/last 0.100'])
+
+        parsed = list(log_analyzer.parse_mapped(self.plain_temp_file, re.compile(self.sample)))
+        self.assertEqual(list(self.data) + [(None, 0), (None, 0), ('/last', 100000)], parsed)
+
+    def test_parse_if_log_empty(self):
+        open(self.plain_temp_file, 'w').close()
+        self.assertEqual([], list(log_analyzer.parse_log(self.plain_temp_file, re.compile(self.sample))))
+
     def test_parse_if_log_gzip(self):
         for parsed in log_analyzer.parse_log(self.gzip_temp_file, re.compile(self.sample), compressed=True):
             self.assertTrue(parsed in self.data, (self.sample, self.data))
@@ -102,6 +135,34 @@ class TestParseLogFile(unittest.TestCase):
         shutil.rmtree(self.temp_dir)
 
 
+class TestSplitLogFile(unittest.TestCase):
+    def setUp(self):
+        self.sample = r'(?P<url>\S+) (?P<request_time>\d+\.\d+)'
+        self.temp_dir = tempfile.mkdtemp()
+        self.temp_file = os.path.join(self.temp_dir, 'log')
+        self.data = [('/api/v2/banner/{}'.format(t * 7919), t * 1000) for t in xrange(0, 1000, 1)]
+
+        with open(self.temp_file, 'wb') as tf:
+            tf.writelines(['{} 0.{:03d}\n'.format(url, t / 1000) for url, t in self.data])
+
+    def test_chunks_aligned_on_newlines(self):
+        chunks = log_analyzer.split_log(self.temp_file, 7)
+        self.assertEqual(7, len(chunks))
+
+        parsed = []
+        for start, end in chunks:
+            parsed.extend(log_analyzer.parse_mapped(self.temp_file, re.compile(self.sample), start, end))
+
+        self.assertEqual(self.data, parsed)
+
+    def test_more_chunks_than_lines(self):
+        chunks = log_analyzer.split_log(self.temp_file, 5000)
+        self.assertEqual(1000, len(chunks))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+
 class TestSQLite(unittest.TestCase):
     def setUp(self):
         self.conn = log_analyzer.connect_to_db()
@@ -119,7 +180,7 @@ class TestSQLite(unittest.TestCase):
 
     def test_fill_requests_table(self):
         url, count = '/api/v2/banner/16852662', 100
-        data = [(url, t / 10.0) for t in xrange(0, count, 1)]
+        data = [(url, t * 100000) for t in xrange(0, count, 1)]
         log_analyzer.fill_table(self.conn, data)
         self.curs.execute("SELECT url, request_time FROM requests WHERE url IS ?", (url, ))
         self.assertEqual(data, self.curs.fetchall())
@@ -162,6 +223,13 @@ class TestSQLite(unittest.TestCase):
         self.curs.execute("SELECT MEDIAN(request_time) FROM requests WHERE url IS ?", (url, ))
         self.assertEqual(4.95, self.curs.fetchone()[0])
 
+    def test_percentile(self):
+        url = '/api/v2/banner/16852665'
+        data = [(url, t / 10.0) for t in xrange(0, 100, 1)]
+        self.conn.executemany("INSERT INTO requests(url, request_time) VALUES (?, ?)", data)
+        self.curs.execute("SELECT PERCENTILE(request_time, 0.5), PERCENTILE(request_time, 0.99) FROM requests")
+        self.assertEqual((4.95, 9.801), tuple(round(value, 3) for value in self.curs.fetchone()))
+
     def test_get_requests_stats_if_no_limit(self):
         d0 = [('/api/v2/banner/16852666', t / 5.0) for t in xrange(0, 100, 1)]
         d1 = [('/api/v2/banner/16852667', t / 10.0) for t in xrange(0, 100, 1)]
@@ -179,6 +247,26 @@ class TestSQLite(unittest.TestCase):
         requests = [r for r in log_analyzer.get_requests_stats(self.conn, limit=None)]
         self.assertEqual(expected, requests)
 
+    def test_get_requests_stats_if_limit(self):
+        d0 = [('/api/v2/banner/16852666', t / 5.0) for t in xrange(0, 100, 1)]
+        d1 = [('/api/v2/banner/16852667', t / 10.0) for t in xrange(0, 100, 1)]
+        d2 = [(None, t / 20.0) for t in xrange(0, 100, 1)]
+
+        expected = [
+            ('/api/v2/banner/16852666', 100, 990.0, 9.9, 19.8, 9.9, 19.602),
+            (None, 100, 247.5, 2.475, 4.95, 2.475, 4.9005)
+        ]
+
+        self.curs.execute("DROP TABLE requests")
+        self.curs.execute("CREATE TABLE requests (url TEXT, request_time REAL)")
+        self.conn.executemany("INSERT INTO requests(url, request_time) VALUES (?, ?)", d2 + d1 + d0)
+        self.conn.execute("DELETE FROM requests WHERE url = '/api/v2/banner/16852667' AND request_time > 2")
+
+        requests = [r[:-1] + (round(r[-1], 4), ) for r in log_analyzer.get_requests_stats(self.conn, 2, (99, ))]
+        self.assertEqual(expected, requests)
+        self.curs.execute("SELECT name FROM sqlite_temp_master")
+        self.assertEqual([], self.curs.fetchall())
+
     def tearDown(self):
         self.curs.close()
         self.conn.close()
@@ -186,14 +274,15 @@ class TestSQLite(unittest.TestCase):
 
 class TestAggrStat(unittest.TestCase):
     def setUp(self):
-        d0 = [t / 5.0 for t in xrange(0, 100, 1)]
-        d1 = [t / 10.0 for t in xrange(0, 100, 1)]
-        d2 = [t / 20.0 for t in xrange(0, 100, 1)]
+        # rows come in integer microseconds, the report is in seconds
+        d0 = [t * 200000 for t in xrange(0, 100, 1)]
+        d1 = [t * 100000 for t in xrange(0, 100, 1)]
+        d2 = [t * 50000 for t in xrange(0, 100, 1)]
 
         self.data = (
-            ('/api/v2/banner/166', len(d0), round(sum(d0), 3), round(sum(d0) / len(d0), 3), round(max(d0), 3), 9.9),
-            ('/api/v2/banner/167', len(d1), round(sum(d1), 3), round(sum(d1) / len(d1), 3), round(max(d1), 3), 4.95),
-            ('/api/v2/banner/168', len(d2), round(sum(d2), 3), round(sum(d2) / len(d2), 3), round(max(d2), 3), 2.475),
+            ('/api/v2/banner/166', len(d0), sum(d0), float(sum(d0)) / len(d0), max(d0), 9900000.0),
+            ('/api/v2/banner/167', len(d1), sum(d1), float(sum(d1)) / len(d1), max(d1), 4950000.0),
+            ('/api/v2/banner/168', len(d2), sum(d2), float(sum(d2)) / len(d2), max(d2), 2475000.0),
         )
 
         self.total_time = sum(d0) + sum(d1) + sum(d2)
@@ -202,27 +291,27 @@ class TestAggrStat(unittest.TestCase):
         self.expected = [
             {'url': '/api/v2/banner/166',
              'count': len(d0),
-             'time_sum': round(sum(d0), 3),
-             'time_avg': round(sum(d0) / len(d0), 3),
-             'time_max': round(max(d0), 3),
+             'time_sum': 990.0,
+             'time_avg': 9.9,
+             'time_max': 19.8,
              'time_med': 9.9,
              'time_perc': round((sum(d0) * 100.0) / self.total_time, 3),
              'count_perc': round((len(d0) * 100.0) / self.total_count, 3),
              },
             {'url': '/api/v2/banner/167',
              'count': len(d1),
-             'time_sum': round(sum(d1), 3),
-             'time_avg': round(sum(d1) / len(d1), 3),
-             'time_max': round(max(d1), 3),
+             'time_sum': 495.0,
+             'time_avg': 4.95,
+             'time_max': 9.9,
              'time_med': 4.95,
              'time_perc': round((sum(d1) * 100.0) / self.total_time, 3),
              'count_perc': round((len(d1) * 100.0) / self.total_count, 3),
              },
             {'url': '/api/v2/banner/168',
              'count': len(d2),
-             'time_sum': round(sum(d2), 3),
-             'time_avg': round(sum(d2) / len(d0), 3),
-             'time_max': round(max(d2), 3),
+             'time_sum': 247.5,
+             'time_avg': 2.475,
+             'time_max': 4.95,
              'time_med': 2.475,
              'time_perc': round((sum(d2) * 100.0) / self.total_time, 3),
              'count_perc': round((len(d2) * 100.0) / self.total_count, 3),
@@ -233,6 +322,15 @@ class TestAggrStat(unittest.TestCase):
         aggr = log_analyzer.aggr_requests_stat(self.data, self.total_time, self.total_count)
         self.assertEqual(self.expected, aggr)
 
+    def test_aggr_requests_stat_with_percentiles(self):
+        data = [row + (row[-1] * 1.5, row[-1] * 2) for row in self.data]
+        aggr = log_analyzer.aggr_requests_stat(data, self.total_time, self.total_count, percentiles=(95, 99))
+
+        for source, row, expected in zip(data, aggr, self.expected):
+            self.assertEqual(round(source[-2] / 1000000, 3), row.pop('time_p95'))
+            self.assertEqual(round(source[-1] / 1000000, 3), row.pop('time_p99'))
+            self.assertEqual(expected, row)
+
 
 class TestRenderTemplate(unittest.TestCase):
     def setUp(self):
@@ -282,5 +380,91 @@ class TestRenderTemplate(unittest.TestCase):
         shutil.rmtree(self.temp_dir)
 
 
+class TestRenderReport(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.src = os.path.join(self.temp_dir, 'report.html')
+        self.dst = os.path.join(self.temp_dir, 'report-2017.06.30.html')
+        self.rows = [{'url': '/api/1', 'count': 1}, {'url': '/api/2', 'count': 2}]
+
+        with open(self.src, 'wb') as tf:
+            tf.write('<script>var table = $table_json; var $$table = $table; var price = "$$5";</script>')
+
+    def render(self, rows):
+        log_analyzer.render_report(self.src, self.dst, rows)
+
+        with open(self.dst, 'rb') as rf:
+            return rf.read()
+
+    def test_streamed_rows_match_template_substitution(self):
+        log_analyzer.render_template(self.src, self.dst, {'table_json': json.dumps(self.rows)})
+        with open(self.dst, 'rb') as rf:
+            expected = rf.read()
+
+        self.assertEqual(expected, self.render(iter(self.rows)))
+
+    def test_empty_rows(self):
+        self.assertIn('var table = [];', self.render([]))
+
+    def test_failed_render_keeps_old_report(self):
+        self.render(self.rows)
+
+        def rows():
+            yield self.rows[0]
+            raise ValueError
+
+        self.assertRaises(ValueError, log_analyzer.render_report, self.src, self.dst, rows())
+
+        with open(self.dst, 'rb') as rf:
+            self.assertIn('/api/2', rf.read())
+        self.assertEqual(['report-2017.06.30.html', 'report.html'], sorted(os.listdir(self.temp_dir)))
+
+    def test_missing_placeholder(self):
+        with open(self.src, 'wb') as tf:
+            tf.write('var table = $$table_json;')
+
+        self.assertRaises(ValueError, log_analyzer.render_report, self.src, self.dst, self.rows)
+
+    def test_repeated_placeholder(self):
+        self.render(self.rows)
+
+        with open(self.src, 'wb') as tf:
+            tf.write('var table = $table_json; var copy = ${table_json};')
+
+        self.assertRaises(ValueError, log_analyzer.render_report, self.src, self.dst, self.rows)
+        with open(self.dst, 'rb') as rf:
+            self.assertIn('$table;', rf.read())
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+
+class TestRenderWindows(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.template = os.path.join(self.temp_dir, 'report.html')
+
+        with open(self.template, 'wb') as tf:
+            tf.write('var table = $table_json;')
+
+        self.window = follow.SlidingWindow(60 * 60, factory=aggregators.StreamAggregator)
+        self.window.update([('/api/v2/banner/1', 100000)], now=0)
+        self.window.update([('/api/v2/banner/2', 200000)], now=50 * 60)
+
+    def test_render_windows(self):
+        reports = log_analyzer.render_windows(self.window, [5, 60], self.template, self.temp_dir, {}, now=52 * 60)
+        self.assertEqual([os.path.join(self.temp_dir, 'report-live-{}m.html'.format(m)) for m in (5, 60)], reports)
+
+        with open(reports[0], 'rb') as rf:
+            self.assertEqual(['/api/v2/banner/2'], [row['url'] for row in json.loads(rf.read()[12:-1])])
+
+    def test_skip_empty_windows(self):
+        reports = log_analyzer.render_windows(self.window, [1, 60], self.template, self.temp_dir, {}, now=52 * 60)
+        self.assertEqual([os.path.join(self.temp_dir, 'report-live-60m.html')], reports)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+
 if __name__ == "__main__":
     unittest.main()
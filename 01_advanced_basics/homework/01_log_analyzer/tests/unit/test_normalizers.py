@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import unittest
+from log_analyzer import normalizers
+
+
+class TestUrlNormalizer(unittest.TestCase):
+    def test_strip_query(self):
+        normalizer = normalizers.UrlNormalizer(strip_query=True)
+        self.assertEqual('/api/1/photogenic_banners/list/',
+                         normalizer.normalize('/api/1/photogenic_banners/list/?server_name=WIN7RB4'))
+
+    def test_collapse_ids(self):
+        normalizer = normalizers.UrlNormalizer(rules=normalizers.id_rules)
+        self.assertEqual('/api/v2/banner/{id}', normalizer.normalize('/api/v2/banner/25019354'))
+        self.assertEqual('/api/v2/slot/{id}/groups', normalizer.normalize('/api/v2/slot/4705/groups'))
+        self.assertEqual('/api/v2/group/{uuid}/banners',
+                         normalizer.normalize('/api/v2/group/1f6d3c8a-3b1c-4e9f-8a2e-6c1d2b3a4f5e/banners'))
+        self.assertEqual('/api/v2/banner2', normalizer.normalize('/api/v2/banner2'))
+
+    def test_custom_rules(self):
+        normalizer = normalizers.UrlNormalizer(rules=[(r'^/export/appinstall_raw/[\d-]+/', '/export/appinstall_raw/{date}/')])
+        self.assertEqual('/export/appinstall_raw/{date}/',
+                         normalizer.normalize('/export/appinstall_raw/2017-06-29/'))
+
+    def test_max_urls(self):
+        normalizer = normalizers.UrlNormalizer(max_urls=2, other='OTHER')
+        urls = ['/a', '/b', '/a', '/c', '/b', '/d', None]
+        self.assertEqual(['/a', '/b', '/a', 'OTHER', '/b', 'OTHER', None], [normalizer.normalize(url) for url in urls])
+
+    def test_stream(self):
+        normalizer = normalizers.UrlNormalizer(strip_query=True, rules=normalizers.id_rules)
+        data = [('/api/v2/banner/1?x=1', '0.1'), (None, '0.0')]
+        self.assertEqual([('/api/v2/banner/{id}', '0.1'), (None, '0.0')], list(normalizer(data)))
+
+    def test_track_urls(self):
+        order = []
+        data = [('/b', 1), ('/a', 2), ('/b', 3), (None, 0)]
+        self.assertEqual(data, list(normalizers.track_urls(data, order)))
+        self.assertEqual(['/b', '/a', None], order)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import re
+import unittest
+from log_analyzer import patterns
+
+
+class TestFastPattern(unittest.TestCase):
+    def setUp(self):
+        self.line = '1.196.116.32 -  - [29/Jun/2017:03:50:22 +0300] "GET /api/v2/banner/25019354 HTTP/1.1" 200 927 ' \
+                    '"-" "Lynx/2.8.8dev.9 libwww-FM/2.14" "-" "1498697422-2190034393-4708-9752759" "dc7161be3" 0.390\n'
+        self.fallback = re.compile(r'(?P<url>\S+) (?P<request_time>\d+\.\d+)')
+        self.pattern = patterns.FastPattern(self.fallback)
+
+    def test_fast_path(self):
+        match = self.pattern.match(self.line)
+        self.assertIsInstance(match, patterns.FastMatch)
+        self.assertEqual(('/api/v2/banner/25019354', '0.390'), (match.group('url'), match.group('request_time')))
+
+    def test_fast_path_matches_regex(self):
+        fast = patterns.ui_log_string_fast.match(self.line)
+        full = patterns.ui_log_string_re.match(self.line)
+        self.assertEqual(full.group('url'), fast.group('url'))
+        self.assertEqual(full.group('request_time'), fast.group('request_time'))
+
+    def test_fast_path_with_bounds(self):
+        buf = 'garbage\n' + self.line + 'garbage'
+        match = self.pattern.match(buf, len('garbage\n'), len(buf) - len('\ngarbage'))
+        self.assertEqual(('/api/v2/banner/25019354', '0.390'), (match.group('url'), match.group('request_time')))
+
+    def test_fallback_if_fast_path_fails(self):
+        match = self.pattern.match('/api/v2/banner/25019354 0.390')
+        self.assertNotIsInstance(match, patterns.FastMatch)
+        self.assertEqual(('/api/v2/banner/25019354', '0.390'), (match.group('url'), match.group('request_time')))
+
+    def test_no_match(self):
+        self.assertIsNone(self.pattern.match('"GET  HTTP/1.1" -'))
+        self.assertIsNone(self.pattern.match(''))
+
+
+class TestLogFormat(unittest.TestCase):
+    def setUp(self):
+        self.line = '1.196.116.32 -  - [29/Jun/2017:03:50:22 +0300] "GET /api/v2/banner/25019354 HTTP/1.1" 200 927 ' \
+                    '"-" "Lynx/2.8.8dev.9 libwww-FM/2.14" "-" "1498697422-2190034393-4708-9752759" "dc7161be3" 0.390\n'
+        self.combined = ['$remote_addr - $remote_user [$time_local] "$request" ',
+                         '$status $body_bytes_sent "$http_referer" "$http_user_agent"']
+
+    def test_parse_log_format(self):
+        self.assertEqual(
+            ['', 'remote_addr', ' [', 'time_local', '] "', 'request', '" ', 'status', ''],
+            patterns.parse_log_format('$remote_addr [${time_local}] "$request" $status')
+        )
+
+    def test_ui_format_matches_regex(self):
+        compiled = patterns.compile_log_format(patterns.ui_log_format)
+        match = compiled.match(self.line)
+        self.assertEqual(('/api/v2/banner/25019354', '0.390'), (match.group('url'), match.group('request_time')))
+        self.assertEqual({'url', 'request_time'}, set(compiled.groupindex))
+
+    def test_other_format_and_variables(self):
+        compiled = patterns.compile_log_format(self.combined, variables=('method', 'url', 'status', 'http_user_agent'))
+        match = compiled.match(
+            '10.0.0.1 - - [29/Jun/2017:03:50:22 +0300] "POST /login?next=/ HTTP/1.0" 302 0 "-" "curl/7.52.1"'
+        )
+        self.assertEqual(
+            {'method': 'POST', 'url': '/login?next=/', 'status': '302', 'http_user_agent': 'curl/7.52.1'},
+            match.groupdict()
+        )
+
+    def test_no_match(self):
+        compiled = patterns.compile_log_format(patterns.ui_log_format)
+        self.assertIsNone(compiled.match(self.line.replace('0.390', '-')))
+        self.assertIsNone(compiled.match('garbage'))
+
+    def test_with_bounds(self):
+        compiled = patterns.compile_log_format(patterns.ui_log_format)
+        buf = 'garbage\n' + self.line
+        self.assertEqual('0.390', compiled.match(buf, len('garbage\n')).group('request_time'))
+
+    def test_cached(self):
+        self.assertIs(
+            patterns.compile_log_format(self.combined, variables=('url', )),
+            patterns.compile_log_format(list(self.combined), variables=['url'])
+        )
+
+    def test_missing_variable(self):
+        self.assertRaises(AssertionError, patterns.compile_log_format, self.combined)
+
+
+class TestParseRequestTime(unittest.TestCase):
+    def test_milliseconds(self):
+        self.assertEqual(390000, patterns.parse_request_time('0.390'))
+        self.assertEqual(12005000, patterns.parse_request_time('12.005'))
+
+    def test_other_precision(self):
+        self.assertEqual(100000, patterns.parse_request_time('0.1'))
+        self.assertEqual(1234567, patterns.parse_request_time('1.2345678'))
+        self.assertEqual(3000012, patterns.parse_request_time('3.000012'))
+
+
+if __name__ == "__main__":
+    unittest.main()
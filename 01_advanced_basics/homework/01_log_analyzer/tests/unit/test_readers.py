@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import gzip
+import shutil
+import unittest
+import tempfile
+from log_analyzer import readers
+
+
+class TestGzipReaders(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.gzip_file = os.path.join(self.temp_dir, 'log.gz')
+        self.lines = ['/api/v2/banner/{} 0.{:03d}'.format(t * 7919, t % 1000) for t in xrange(0, 20000, 1)]
+
+        with gzip.open(self.gzip_file, 'wb') as gf:
+            gf.write('\n'.join(self.lines[:10000]) + '\n')
+
+        with gzip.open(self.gzip_file, 'ab') as gf:
+            gf.write('\n'.join(self.lines[10000:]))
+
+    def read(self, lines):
+        return [line.rstrip('\n') for line in lines]
+
+    def test_plain_reader(self):
+        self.assertEqual(self.lines, self.read(readers.read_gzip(self.gzip_file, reader='gzip')))
+
+    def test_threaded_reader(self):
+        lines = readers.read_gzip_threaded(self.gzip_file, block_size=4096, queue_size=2)
+        self.assertEqual(self.lines, self.read(lines))
+
+    def test_threaded_reader_stops_early(self):
+        lines = readers.read_gzip_threaded(self.gzip_file, block_size=1024, queue_size=1)
+        self.assertEqual(self.lines[0], next(lines))
+        lines.close()
+
+    @unittest.skipUnless(readers.find_decompressor(), 'no external gzip decompressor')
+    def test_pipe_reader(self):
+        self.assertEqual(self.lines, self.read(readers.read_gzip(self.gzip_file, reader='pipe')))
+
+    @unittest.skipUnless(readers.find_decompressor(), 'no external gzip decompressor')
+    def test_pipe_reader_if_broken(self):
+        with open(self.gzip_file, 'wb') as gf:
+            gf.write('garbage')
+
+        with self.assertRaises(IOError):
+            list(readers.read_gzip(self.gzip_file, reader='pipe'))
+
+    def test_unknown_reader(self):
+        with self.assertRaises(ValueError):
+            readers.read_gzip(self.gzip_file, reader='bzip2')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+
+if __name__ == "__main__":
+    unittest.main()
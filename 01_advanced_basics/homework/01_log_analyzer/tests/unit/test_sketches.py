@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import random
+import bisect
+import unittest
+from log_analyzer import sketches
+
+
+class TestQuantile(unittest.TestCase):
+    def test_quantile_interpolates(self):
+        values = [t / 10.0 for t in xrange(99, -1, -1)]
+        self.assertEqual((0.0, 4.95, 9.9), sketches.quantiles(values, (0.0, 0.5, 1.0)))
+        self.assertAlmostEqual(9.405, sketches.quantile(values, 0.95))
+
+
+class TestKLLSketch(unittest.TestCase):
+    def setUp(self):
+        rnd = random.Random(42)
+        self.data = [rnd.expovariate(5.0) for __ in xrange(50000)]
+        self.sorted = sorted(self.data)
+        self.epsilon = 0.03
+
+    def rank(self, value):
+        return bisect.bisect_left(self.sorted, value) / float(len(self.sorted))
+
+    def test_exact_if_less_than_k(self):
+        sketch = sketches.KLLSketch(k=200)
+        for value in self.data[:200]:
+            sketch.append(value)
+
+        self.assertTrue(sketch.exact)
+        self.assertEqual(sketches.quantile(self.data[:200], 0.5), sketch.quantile(0.5))
+
+    def test_memory_is_bounded(self):
+        sketch = sketches.KLLSketch(k=200)
+        for value in self.data:
+            sketch.append(value)
+
+        self.assertEqual(len(self.data), len(sketch))
+        self.assertLess(sketch.size, 3 * 200)
+
+    def test_rank_error(self):
+        sketch = sketches.KLLSketch(k=200)
+        for value in self.data:
+            sketch.append(value)
+
+        for q in (0.5, 0.95, 0.99):
+            self.assertAlmostEqual(q, self.rank(sketch.quantile(q)), delta=self.epsilon)
+
+    def test_merge(self):
+        left, right = sketches.KLLSketch(k=200), sketches.KLLSketch(k=200)
+        for value in self.data[:20000]:
+            left.append(value)
+        for value in self.data[20000:]:
+            right.append(value)
+
+        merged = left.merge(right)
+        self.assertEqual(len(self.data), len(merged))
+        self.assertLess(merged.size, 3 * 200)
+
+        for q in (0.5, 0.95, 0.99):
+            self.assertAlmostEqual(q, self.rank(merged.quantile(q)), delta=self.epsilon)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -197,34 +197,162 @@ def poll_poller(timeout=0.0, map=None):
 poll = select_poller
 poll2 = poll3 = poll_poller
 
-def epoll_poller(timeout=0.0, map=None):
-    """A poller which uses epoll(), supported on Linux 2.5.44 and newer."""
-    if map is None:
-        map = socket_map
-    pollster = select.epoll()
-    if map:
-        for fd, obj in map.items():
-            flags = 0
-            if obj.readable():
-                flags |= select.POLLIN | select.POLLPRI
-            if obj.writable():
-                flags |= select.POLLOUT
-            if flags:
-                # Only check for exceptions if object was either readable
-                # or writable.
-                flags |= select.POLLERR | select.POLLHUP | select.POLLNVAL
-                pollster.register(fd, flags)
+class persistent_epoll:
+    """epoll instance kept across loop iterations.
+
+    fds are registered once, when they enter the map, and unregistered
+    when they leave it.  Interest masks are only recomputed for channels
+    that were added, got events or called interest_changed(), so a tick
+    costs O(active) rather than O(connections).
+
+    In edge-triggered mode every fd is registered once for both
+    directions and the mask is never modified; readiness reported by the
+    kernel is remembered until the channel runs into EWOULDBLOCK, and a
+    channel that still has readiness it is interested in is serviced
+    again on the next tick without waiting.
+    """
+
+    def __init__(self, map, edge=False):
+        self.map = map
+        self.edge = edge
+        self.pid = os.getpid()
+        self.epoll = select.epoll()
+        self.masks = {}
+        self.changed = set(map)
+        self.ready = {}
+        self.pending = set()
+
+    def close(self):
+        self.epoll.close()
+
+    def added(self, fd):
+        self.changed.add(fd)
+
+    def removed(self, fd):
+        self.changed.discard(fd)
+        self.pending.discard(fd)
+        self.ready.pop(fd, None)
+        if self.masks.pop(fd, None) is not None:
+            try:
+                self.epoll.unregister(fd)
+            except OSError:
+                # already closed, the kernel dropped it by itself
+                pass
+
+    def blocked(self, fd, flags):
+        if fd in self.ready:
+            self.ready[fd] &= ~flags
+
+    def register(self, fd, mask):
+        old = self.masks.get(fd)
+        if old == mask:
+            return
+        if old is None:
+            self.epoll.register(fd, mask)
+        else:
+            self.epoll.modify(fd, mask)
+        self.masks[fd] = mask
+
+    def update(self, fd, obj):
+        is_r = obj.readable()
+        # accepting sockets should not be writable
+        is_w = obj.writable() and not obj.accepting
+
+        if not self.edge:
+            mask = 0
+            if is_r:
+                mask |= select.EPOLLIN | select.EPOLLPRI
+            if is_w:
+                mask |= select.EPOLLOUT
+            self.register(fd, mask)
+            return
+
+        self.register(fd, select.EPOLLIN | select.EPOLLPRI | select.EPOLLOUT | select.EPOLLET)
+        flags = self.ready.get(fd, 0)
+        if flags & (select.EPOLLERR | select.EPOLLHUP) or \
+                flags & (select.EPOLLIN | select.EPOLLPRI) and is_r or flags & select.EPOLLOUT and is_w:
+            self.pending.add(fd)
+
+    def poll(self, timeout=0.0):
+        map = self.map
+        changed, self.changed = self.changed, set()
+        for fd in changed:
+            obj = map.get(fd)
+            if obj is not None:
+                self.update(fd, obj)
+
+        if self.pending:
+            timeout = 0
+        elif timeout is None:
+            timeout = -1
+
         try:
-            r = pollster.poll(timeout)
-        except select.error as err:
-            if err.args[0] != EINTR:
-                raise
+            r = self.epoll.poll(timeout)
+        except InterruptedError:
             r = []
+
+        if not self.edge:
+            for fd, flags in r:
+                obj = map.get(fd)
+                if obj is None:
+                    continue
+                readwrite(obj, flags)
+                # handlers are what changes readable()/writable()
+                self.changed.add(fd)
+            return
+
         for fd, flags in r:
+            self.ready[fd] = self.ready.get(fd, 0) | flags
+            self.pending.add(fd)
+
+        pending, self.pending = self.pending, set()
+        for fd in pending:
             obj = map.get(fd)
             if obj is None:
                 continue
+            flags = self.ready.get(fd, 0)
+            if not obj.readable():
+                flags &= ~(select.EPOLLIN | select.EPOLLPRI)
+            if not obj.writable() or obj.accepting:
+                flags &= ~select.EPOLLOUT
+            # priority data is reported once, it is not a lasting state
+            self.blocked(fd, select.EPOLLPRI)
             readwrite(obj, flags)
+            self.changed.add(fd)
+
+
+_epolls = {}
+
+
+def _get_epoll(map, edge):
+    pollster = _epolls.get(id(map))
+    if pollster is not None and pollster.map is map and pollster.edge == edge and pollster.pid == os.getpid():
+        return pollster
+
+    # an epoll instance inherited through fork() is shared with the parent, it is never reused
+    if pollster is not None and pollster.pid == os.getpid():
+        pollster.close()
+    pollster = _epolls[id(map)] = persistent_epoll(map, edge)
+    return pollster
+
+
+def _channel_event(map, fd, event, *args):
+    pollster = _epolls.get(id(map))
+    if pollster is not None and pollster.map is map and pollster.pid == os.getpid():
+        getattr(pollster, event)(fd, *args)
+
+
+def epoll_poller(timeout=0.0, map=None):
+    """A poller which uses epoll(), supported on Linux 2.5.44 and newer."""
+    if map is None:
+        map = socket_map
+    _get_epoll(map, edge=False).poll(timeout)
+
+def epoll_edge_poller(timeout=0.0, map=None):
+    """Same as epoll_poller(), but edge-triggered."""
+    if map is None:
+        map = socket_map
+    _get_epoll(map, edge=True).poll(timeout)
 
 def kqueue_poller(timeout=0.0, map=None):
     """A poller which uses kqueue(), BSD specific."""
@@ -267,8 +395,6 @@ def loop(timeout=30.0, use_poll=False, map=None, count=None,
     # "poller"
     if use_poll and hasattr(select, 'poll'):
         poller = poll_poller
-    else:
-        poller = select_poller
 
     if count is None:
         while map:
@@ -340,6 +466,7 @@ class dispatcher:
         if map is None:
             map = self._map
         map[self._fileno] = self
+        _channel_event(map, self._fileno, 'added')
 
     def del_channel(self, map=None):
         fd = self._fileno
@@ -348,6 +475,7 @@ class dispatcher:
         if fd in map:
             #self.log_info('closing channel %d:%s' % (fd, self))
             del map[fd]
+            _channel_event(map, fd, 'removed')
         self._fileno = None
 
     def create_socket(self, family=socket.AF_INET, type=socket.SOCK_STREAM):
@@ -382,6 +510,11 @@ class dispatcher:
     def readable(self):
         return True
 
+    def interest_changed(self):
+        # readable()/writable() are re-checked after every event of this
+        # channel; call this when they change from outside its handlers
+        _channel_event(self._map, self._fileno, 'added')
+
     def writable(self):
         return True
 
@@ -420,7 +553,10 @@ class dispatcher:
         except TypeError:
             return None
         except socket.error as why:
-            if why.args[0] in (EWOULDBLOCK, ECONNABORTED, EAGAIN):
+            if why.args[0] in (EWOULDBLOCK, EAGAIN):
+                _channel_event(self._map, self._fileno, 'blocked', select.POLLIN)
+                return None
+            elif why.args[0] == ECONNABORTED:
                 return None
             else:
                 raise
@@ -432,7 +568,21 @@ class dispatcher:
             result = self.socket.send(data)
             return result
         except socket.error as why:
-            if why.args[0] == EWOULDBLOCK:
+            if why.args[0] in (EWOULDBLOCK, EAGAIN):
+                _channel_event(self._map, self._fileno, 'blocked', select.POLLOUT)
+                return 0
+            elif why.args[0] in _DISCONNECTED:
+                self.handle_close()
+                return 0
+            else:
+                raise
+
+    def sendfile(self, fd, offset, count):
+        try:
+            return os.sendfile(self._fileno, fd, offset, count)
+        except socket.error as why:
+            if why.args[0] in (EWOULDBLOCK, EAGAIN):
+                _channel_event(self._map, self._fileno, 'blocked', select.POLLOUT)
                 return 0
             elif why.args[0] in _DISCONNECTED:
                 self.handle_close()
@@ -451,8 +601,12 @@ class dispatcher:
             else:
                 return data
         except socket.error as why:
+            if why.args[0] in (EWOULDBLOCK, EAGAIN):
+                # nothing to read yet, the connection is still open
+                _channel_event(self._map, self._fileno, 'blocked', select.POLLIN)
+                return b''
             # winsock sometimes raises ENOTCONN
-            if why.args[0] in _DISCONNECTED:
+            elif why.args[0] in _DISCONNECTED:
                 self.handle_close()
                 return b''
             else:
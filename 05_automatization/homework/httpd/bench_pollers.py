@@ -0,0 +1,132 @@
+import os
+import sys
+import time
+import random
+import socket
+import resource
+import argparse
+import asyncore_epoll
+
+POLLERS = {
+    'poll': asyncore_epoll.poll_poller,
+    'epoll': asyncore_epoll.epoll_poller,
+    'epoll-edge': asyncore_epoll.epoll_edge_poller,
+}
+
+
+class Echo(asyncore_epoll.dispatcher):
+    def __init__(self, sock, map):
+        super(Echo, self).__init__(sock, map)
+        self.out_buffer = b''
+
+    def handle_read(self):
+        self.out_buffer += self.recv(64)
+
+    def handle_write(self):
+        self.out_buffer = self.out_buffer[self.send(self.out_buffer):]
+
+    def writable(self):
+        return bool(self.out_buffer)
+
+    def handle_close(self):
+        self.close()
+
+
+class Listener(asyncore_epoll.dispatcher):
+    def __init__(self, map):
+        super(Listener, self).__init__(map=map)
+        self.map = map
+        self.accepted = 0
+        self.create_socket()
+        self.set_reuse_addr()
+        self.bind(('127.0.0.1', 0))
+        self.listen(4096)
+
+    def handle_accept(self):
+        # drain the backlog, one accept per event would take a tick per connection
+        while True:
+            pair = self.accept()
+            if pair is None:
+                return
+            Echo(pair[0], self.map)
+            self.accepted += 1
+
+
+def raise_nofile(needed):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < needed:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard, needed), hard))
+    return resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+
+
+def client(addr, connections, rounds, active, results):
+    # idle connections are held open, each round wakes a few of them up and waits for the echo
+    socks = [socket.create_connection(addr) for __ in range(connections)]
+    started = time.time()
+
+    for __ in range(rounds):
+        sample = random.sample(socks, active)
+        for sock in sample:
+            sock.sendall(b'x')
+        for sock in sample:
+            sock.recv(1)
+
+    elapsed = time.time() - started
+    for sock in socks:
+        sock.close()
+
+    os.write(results, '{:.6f}'.format(elapsed).encode())
+
+
+def measure(name, connections, rounds, active):
+    map = {}
+    listener = Listener(map)
+    poller = POLLERS[name]
+    addr = listener.socket.getsockname()
+    results, writer = os.pipe()
+
+    pid = os.fork()
+    if pid == 0:
+        os.close(results)
+        listener.socket.close()
+        try:
+            client(addr, connections, rounds, active, writer)
+        finally:
+            os._exit(0)
+
+    os.close(writer)
+    ticks = 0
+
+    # the client closes everything when it is done, only the listener is left
+    while listener.accepted < connections or len(map) > 1:
+        poller(0.5, map)
+        ticks += 1
+
+    os.waitpid(pid, 0)
+    elapsed = float(os.read(results, 64))
+    os.close(results)
+    listener.close()
+
+    return {'poller': name, 'ticks': ticks, 'elapsed': elapsed, 'rounds_per_sec': rounds / elapsed}
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('-c', '--connections', action='store', type=int, default=10000)
+    ap.add_argument('-r', '--rounds', action='store', type=int, default=2000)
+    ap.add_argument('-a', '--active', action='store', type=int, default=10)
+    ap.add_argument('-p', '--poller', action='append', choices=sorted(POLLERS), default=None)
+    args = ap.parse_args()
+
+    limit = raise_nofile(args.connections + 64)
+    if limit < args.connections + 64:
+        sys.exit('RLIMIT_NOFILE is {}, not enough for {} connections'.format(limit, args.connections))
+
+    print('{} idle connections, {} rounds of {} active'.format(args.connections, args.rounds, args.active))
+    print('{:<12} {:>10} {:>12} {:>14}'.format('poller', 'seconds', 'rounds/sec', 'us per round'))
+
+    for name in args.poller or ['poll', 'epoll', 'epoll-edge']:
+        result = measure(name, args.connections, args.rounds, args.active)
+        print('{poller:<12} {elapsed:>10.3f} {rounds_per_sec:>12,.0f} {0:>14,.0f}'.format(
+            result['elapsed'] * 1e6 / args.rounds, **result
+        ))
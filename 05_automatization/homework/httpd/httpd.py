@@ -1,5 +1,6 @@
 import os
 import sys
+import stat
 import time
 import socket
 import signal
@@ -7,9 +8,10 @@ import logging
 import argparse
 import asyncore_epoll
 from io import BytesIO
+from collections import OrderedDict, deque
 from mimetypes import guess_type
 from urllib.parse import unquote, urlparse
-from utils import httpdate
+from utils import httpdate, parse_httpdate
 
 CRLF = b'\r\n'
 ENCODING = 'UTF-8'
@@ -19,6 +21,7 @@ REDIRECT_TO = getattr(os, 'devnull', '/dev/null')
 SERVER = 'OTUServer'
 
 OK = 200
+NOT_MODIFIED = 304
 BAD_REQUEST = 400
 NOT_FOUND = 404
 NOT_ALLOWED = 405
@@ -48,20 +51,142 @@ class Request(object):
 
 
 class ContentFile(object):
-    def __init__(self, path):
+    def __init__(self, path, fd, st, small_size=0):
         self.path = path
+        self.fd = fd
+        self.size = st.st_size
+        self.mtime = st.st_mtime
+        self.state = (st.st_ino, st.st_size, st.st_mtime_ns)
+        self.checked = time.monotonic()
+        self.content = None
+        self.refs = 0
+        self.evicted = False
+        self.etag = '"{:x}-{:x}-{:x}"'.format(st.st_ino, st.st_size, st.st_mtime_ns)
+        self.validators = {'Last-Modified': httpdate(self.mtime), 'ETag': self.etag}
+        self.headers = dict(self.validators, **{
+            'Content-Type': guess_type(path)[0] or 'application/octet-stream',
+            'Content-Length': self.size,
+        })
+
+        # small files are kept in memory and their fd is not held open
+        if self.size <= small_size:
+            with os.fdopen(fd, 'rb') as f:
+                self.content = f.read(self.size)
+            self.fd = None
+
+    def changed(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return True
+        return (st.st_ino, st.st_size, st.st_mtime_ns) != self.state
 
-    @property
-    def content(self):
-        with open(self.path, 'rb') as f:
-            return f.read()
+    def open(self):
+        return FileBody(self)
 
-    @property
-    def meta(self):
-        content_type = guess_type(self.path)
-        if isinstance(content_type, tuple):
-            content_type = content_type[0]
-        return {'Content-Type': content_type, 'Content-Length': os.path.getsize(self.path)}
+    def acquire(self):
+        self.refs += 1
+
+    def release(self):
+        self.refs -= 1
+        if self.evicted and not self.refs:
+            self.close()
+
+    def evict(self):
+        # a file evicted while being sent stays open until its last FileBody is closed
+        self.evicted = True
+        if not self.refs:
+            self.close()
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+class FileCache(object):
+    def __init__(self, max_files=512, max_content=16 << 20, small_size=64 << 10, revalidate=1.0,
+                 index_file='index.html'):
+        self.max_files = max_files
+        self.max_content = max_content
+        self.small_size = small_size
+        self.revalidate = revalidate
+        self.index_file = index_file
+        # request path -> ContentFile, least recently used first
+        self.files = OrderedDict()
+        self.content_size = 0
+
+    def open(self, path):
+        fd = os.open(path, os.O_RDONLY)
+        st = os.fstat(fd)
+
+        if stat.S_ISDIR(st.st_mode):
+            os.close(fd)
+            path = os.path.join(path, self.index_file)
+            fd = os.open(path, os.O_RDONLY)
+            st = os.fstat(fd)
+
+        if not stat.S_ISREG(st.st_mode):
+            os.close(fd)
+            return None
+
+        return ContentFile(path, fd, st, small_size=self.small_size)
+
+    def get(self, path):
+        now = time.monotonic()
+        file = self.files.get(path)
+
+        # a cached file is trusted for revalidate seconds, then one stat() tells if it changed
+        if file is not None and now - file.checked >= self.revalidate:
+            if file.changed():
+                self.evict(path)
+                file = None
+            else:
+                file.checked = now
+
+        if file is not None:
+            self.files.move_to_end(path)
+            return file
+
+        try:
+            file = self.open(path)
+        except OSError:
+            return None
+
+        if file is None:
+            return None
+
+        self.files[path] = file
+        self.content_size += len(file.content or b'')
+
+        while len(self.files) > self.max_files or self.content_size > self.max_content:
+            self.evict(next(iter(self.files)))
+
+        return file
+
+    def evict(self, path):
+        file = self.files.pop(path)
+        self.content_size -= len(file.content or b'')
+        file.evict()
+
+
+class FileBody(object):
+    def __init__(self, file):
+        self.file = file
+        self.offset = 0
+        self.size = file.size
+        file.acquire()
+
+    def remaining(self):
+        return self.size - self.offset
+
+    def send_to(self, channel):
+        sent = channel.sendfile(self.file.fd, self.offset, self.remaining())
+        self.offset += sent
+        return sent
+
+    def close(self):
+        self.file.release()
 
 
 class Response(object):
@@ -73,6 +198,8 @@ class Response(object):
         self.text = text
         self.headers = {}
         self._content = b''
+        # body sent with sendfile() instead of content
+        self.file = None
 
     @property
     def version(self):
@@ -118,26 +245,76 @@ class Buffer(BytesIO):
         self.seek(old, os.SEEK_SET)
         return count
 
+    def remaining(self):
+        return len(self) - self.tell()
+
+    def send_to(self, channel, size=65536):
+        cur = self.tell()
+        sent = channel.send(self.read(size))
+        self.seek(cur + sent, os.SEEK_SET)
+        return sent
+
+    def consume(self, size):
+        data = self.getvalue()
+        self.seek(0, os.SEEK_SET)
+        self.truncate()
+        self.write(data[size:])
+        self.seek(0, os.SEEK_SET)
+        return data[:size]
+
 
 class Handler(asyncore_epoll.dispatcher):
     versions = frozenset(['HTTP/1.1', 'HTTP/1.0'])
     index_file = 'index.html'
-
-    def __init__(self, sock):
+    recv_size = 4096
+    keep_alive_timeout = 15
+    max_requests = 100
+    max_header_size = 65536
+    # shared by all connections of a worker, every forked worker fills its own
+    files = FileCache(index_file=index_file)
+
+    def __init__(self, sock, connections=None):
         super(Handler, self).__init__(sock)
 
         self.request = Request()
         self.in_buffer = Buffer()
-        self.out_buffer = Buffer()
+        # Buffers with headers and small bodies and FileBody objects, in the order they are sent
+        self.out_queue = deque()
+        self.requests = 0
+        self.closing = False
+        # handler -> last activity, oldest first; used by the worker to drop idle connections
+        self.connections = connections
+        self.touch()
+
+    def touch(self):
+        if self.connections is not None and self.connected:
+            self.connections[self] = time.monotonic()
+            self.connections.move_to_end(self)
 
     def get_file(self):
-        path = self.request.path.lstrip('/')
+        return self.files.get(self.request.path.lstrip('/'))
 
-        if os.path.isdir(path):
-            path = os.path.join(path, self.index_file)
+    def not_modified(self, file):
+        # If-None-Match wins over If-Modified-Since, etags are compared weakly as GET and HEAD allow
+        if_none_match = self.request.headers.get('if-none-match')
+        if if_none_match is not None:
+            etags = [etag.strip() for etag in if_none_match.split(',')]
+            return '*' in etags or file.etag in [etag[2:] if etag.startswith('W/') else etag for etag in etags]
+
+        if_modified_since = self.request.headers.get('if-modified-since')
+        if if_modified_since is not None:
+            since = parse_httpdate(if_modified_since)
+            return since is not None and int(file.mtime) <= since
 
-        if os.path.isfile(path):
-            return ContentFile(path)
+        return False
+
+    def conditional(self, file):
+        if not self.not_modified(file):
+            return None
+
+        response = Response(NOT_MODIFIED, 'Not Modified')
+        response.headers.update(file.validators)
+        return response
 
     def get(self):
         file = self.get_file()
@@ -145,9 +322,17 @@ class Handler(asyncore_epoll.dispatcher):
         if not file:
             return Response(NOT_FOUND, ERRORS[NOT_FOUND])
 
+        response = self.conditional(file)
+        if response:
+            return response
+
         response = Response(OK, 'OK')
-        response.content = file.content
-        response.headers.update(file.meta)
+        response.headers.update(file.headers)
+
+        if file.content is not None:
+            response.content = file.content
+        else:
+            response.file = file.open()
         return response
 
     def head(self):
@@ -156,8 +341,12 @@ class Handler(asyncore_epoll.dispatcher):
         if not file:
             return Response(NOT_FOUND, ERRORS[NOT_FOUND])
 
+        response = self.conditional(file)
+        if response:
+            return response
+
         response = Response(OK, 'OK')
-        response.headers.update(file.meta)
+        response.headers.update(file.headers)
         return response
 
     def parse_status_line(self, line):
@@ -185,13 +374,12 @@ class Handler(asyncore_epoll.dispatcher):
             if len(parts) != 2:
                 errors.append(line)
             else:
-                self.request.headers[parts[0].strip()] = parts[1].strip()
+                self.request.headers[parts[0].strip().lower()] = parts[1].strip()
 
         if errors:
             raise InvalidRequest()
 
-    def parse(self):
-        raw = self.in_buffer.getvalue()
+    def parse(self, raw):
         lines = [line.strip().decode(ENCODING) for line in raw.split(CRLF) if line.strip()]
 
         if not lines:
@@ -200,9 +388,9 @@ class Handler(asyncore_epoll.dispatcher):
         self.parse_status_line(lines.pop(0))
         self.parse_headers(lines)
 
-    def _handle(self):
+    def _handle(self, raw):
         try:
-            self.parse()
+            self.parse(raw)
         except InvalidRequest:
             return Response(INVALID_REQUEST, ERRORS[INVALID_REQUEST])
         except Exception as e:
@@ -218,63 +406,135 @@ class Handler(asyncore_epoll.dispatcher):
         except Exception as e:
             return Response(INTERNAL_ERROR, ERRORS[INTERNAL_ERROR])
 
-    def handle(self):
-        response = self._handle()
-        response.version = self.request.version
+    def keep_alive(self, response):
+        if self.requests >= self.max_requests:
+            return False
+
+        # after a broken request or one with a body the next request can't be found in the stream
+        if response.code in (BAD_REQUEST, INVALID_REQUEST, INTERNAL_ERROR) or \
+                self.request.headers.get('content-length', '0') != '0' or 'transfer-encoding' in self.request.headers:
+            return False
+
+        tokens = [token.strip().lower() for token in self.request.headers.get('connection', '').split(',')]
+
+        if 'close' in tokens:
+            return False
+
+        return self.request.version == 'HTTP/1.1' or 'keep-alive' in tokens
+
+    def handle(self, raw):
+        self.request = Request()
+        self.requests += 1
+
+        response = self._handle(raw)
+        if self.request.version:
+            response.version = self.request.version
         response.headers['Server'] = SERVER
         response.headers['Date'] = httpdate()
-        response.headers['Connection'] = 'close'
+        # a 304 has no body, its Content-Length would describe the file it was not sent
+        if response.code != NOT_MODIFIED:
+            response.headers.setdefault('Content-Length', len(response.content))
+
+        if self.keep_alive(response):
+            response.headers['Connection'] = 'keep-alive'
+            response.headers['Keep-Alive'] = 'timeout={}, max={}'.format(
+                self.keep_alive_timeout, self.max_requests - self.requests
+            )
+        else:
+            response.headers['Connection'] = 'close'
+            self.closing = True
+
         return response
 
-    def end_of_data(self):
-        res = False
-        buf = self.in_buffer
-        old = buf.tell()
-        end = len(buf)
+    def process(self):
+        # pipelined requests are answered in order, each response is queued behind the previous one
+        while not self.closing:
+            raw = self.in_buffer.getvalue()
+            end = raw.find(CRLF * 2)
+
+            if end < 0:
+                if len(raw) > self.max_header_size:
+                    self.closing = True
+                    response = Response(BAD_REQUEST, ERRORS[BAD_REQUEST])
+                    response.headers.update({'Server': SERVER, 'Date': httpdate(), 'Content-Length': 0,
+                                             'Connection': 'close'})
+                    self.write_out(response.header)
+                return
+
+            response = self.handle(self.in_buffer.consume(end + len(CRLF * 2)))
+            self.write_out(response.header)
+
+            if response.file:
+                self.out_queue.append(response.file)
+            else:
+                self.write_out(response.content)
 
-        buf.seek(0, os.SEEK_SET)
+    def write_out(self, data):
+        if not data:
+            return
 
-        while buf.tell() < end:
-            if buf.readline() == CRLF:
-                res = True
-                break
+        if not self.out_queue or not isinstance(self.out_queue[-1], Buffer):
+            self.out_queue.append(Buffer())
+        self.out_queue[-1].append(data)
 
-        buf.seek(old, os.SEEK_SET)
-        return res
+    def pending(self):
+        return bool(self.out_queue)
 
     def handle_read(self):
-        end_of_data = self.end_of_data
-
-        while not end_of_data():
-            chunk = self.in_buffer.append(self.recv(1024))
-            if not chunk:
-                return  # connection was closed
+        data = self.recv(self.recv_size)
+        if not data:
+            return  # connection was closed or there is nothing to read yet
 
-        response = self.handle()
-        self.out_buffer.append(response.header)
-        self.out_buffer.append(response.content)
+        self.touch()
+        self.in_buffer.append(data)
+        self.process()
 
     def handle_write(self):
-        cur = self.out_buffer.tell()
-        cur += self.send(self.out_buffer.read(1024))
-        self.out_buffer.seek(cur, os.SEEK_SET)
-        
-        if self.out_buffer.tell() == len(self.out_buffer):
+        while self.out_queue:
+            item = self.out_queue[0]
+            item.send_to(self)
+
+            # the socket buffer is full, the rest goes on the next write event
+            if item.remaining():
+                break
+
+            self.out_queue.popleft().close()
+
+        self.touch()
+
+        if self.closing and not self.out_queue:
             self.close()
 
     def handle_close(self):
-        self.close()
+        # a client may shut down its side right after sending pipelined requests, answer them first
+        if self.closing or not self.pending():
+            self.close()
+        else:
+            self.closing = True
+
+    def close(self):
+        super(Handler, self).close()
+        if self.connections is not None:
+            self.connections.pop(self, None)
+
+        while self.out_queue:
+            self.out_queue.popleft().close()
+
+    def readable(self):
+        return not self.closing
 
     def writable(self):
-        res = (not self.connected) or (self.out_buffer.tell() != len(self.out_buffer))
+        res = (not self.connected) or self.pending()
         return res
 
 
 class Worker(asyncore_epoll.dispatcher):
-    def __init__(self, addr, handler_class, backlog, poll_interval):
+    def __init__(self, addr, handler_class, backlog, poll_interval, edge_triggered=False):
         self.handler = handler_class
         self.backlog = backlog
         self.poll_interval = poll_interval
+        self.poller = asyncore_epoll.epoll_edge_poller if edge_triggered else asyncore_epoll.epoll_poller
+        self.connections = OrderedDict()
 
         sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
@@ -284,23 +544,41 @@ class Worker(asyncore_epoll.dispatcher):
 
     def run(self):
         self.listen(num=self.backlog)
-        asyncore_epoll.loop(timeout=self.poll_interval, poller=asyncore_epoll.epoll_poller)
+        next_sweep = 0
+
+        while self._map:
+            self.poller(self.poll_interval, self._map)
+
+            now = time.monotonic()
+            if now >= next_sweep:
+                self.close_idle(now)
+                next_sweep = now + 1
+
+    def close_idle(self, now):
+        deadline = now - self.handler.keep_alive_timeout
+
+        while self.connections:
+            handler, last_active = next(iter(self.connections.items()))
+            if last_active > deadline:
+                break
+            handler.close()
 
     def handle_accepted(self, sock, addr):
-        self.handler(sock=sock)
+        self.handler(sock=sock, connections=self.connections)
 
 
 class HTTPServer(object):
-    def __init__(self, addr, handler_class, workers, backlog=5, poll_interval=0.5):
+    def __init__(self, addr, handler_class, workers, backlog=5, poll_interval=0.5, edge_triggered=False):
         self.addr = addr
         self.handler = handler_class
         self.workers = workers
         self.backlog = backlog
         self.poll_interval = poll_interval
+        self.edge_triggered = edge_triggered
         self.workers_map = []
 
     def spawn_worker(self):
-        worker = Worker(self.addr, self.handler, self.backlog, self.poll_interval)
+        worker = Worker(self.addr, self.handler, self.backlog, self.poll_interval, self.edge_triggered)
 
         pid = os.fork()
 
@@ -363,10 +641,16 @@ if __name__ == "__main__":
     ap.add_argument('-p', '--port', action='store', type=int, default=8080)
     ap.add_argument('-r', '--document-root', action='store', default='/var/www')
     ap.add_argument('-w', '--workers', action='store', type=int, default=4)
+    ap.add_argument('-e', '--edge-triggered', action='store_true', default=False)
+    ap.add_argument('-t', '--keep-alive-timeout', action='store', type=float, default=Handler.keep_alive_timeout)
+    ap.add_argument('-m', '--max-requests', action='store', type=int, default=Handler.max_requests)
     args = ap.parse_args()
 
+    Handler.keep_alive_timeout = args.keep_alive_timeout
+    Handler.max_requests = args.max_requests
+
     os.chdir(args.document_root)
     logging.info('starting server at {}:{}, pid {}'.format(args.address, args.port, os.getpid()))
 
-    server = HTTPServer((args.address, args.port), Handler, workers=args.workers)
+    server = HTTPServer((args.address, args.port), Handler, workers=args.workers, edge_triggered=args.edge_triggered)
     server.serve_forever()
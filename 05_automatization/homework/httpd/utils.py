@@ -1,15 +1,26 @@
 from datetime import datetime
+from email.utils import parsedate_tz, mktime_tz
 
 WEEKDAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
 MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
           'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
 
 
-def httpdate():
+def httpdate(timestamp=None):
     """Return a string representation of a date according to RFC 1123
-    (HTTP/1.1).
+    (HTTP/1.1), current time unless a timestamp is given.
 
     """
-    dt = datetime.utcnow()
-    return '%s, %02d %s %04d %02d:%02d:%02d GMT' % (WEEKDAYS[dt.month - 1], dt.day, MONTHS[dt.month - 1],
+    dt = datetime.utcnow() if timestamp is None else datetime.utcfromtimestamp(timestamp)
+    return '%s, %02d %s %04d %02d:%02d:%02d GMT' % (WEEKDAYS[dt.weekday()], dt.day, MONTHS[dt.month - 1],
                                                     dt.year, dt.hour, dt.minute, dt.second)
+
+
+def parse_httpdate(value):
+    """Return a timestamp for an HTTP date, None if it can't be parsed.
+
+    """
+    parsed = parsedate_tz(value)
+    if parsed is None:
+        return None
+    return mktime_tz(parsed)